@@ -0,0 +1,12 @@
+# Benchmarks for the dashboard callbacks
+#
+#   python -m benchmarks                     # bundled data plus 10x and 100x synthetic data
+#   python -m benchmarks --scales 1 1000     # up to 1000x (several GB of memory)
+#   python -m benchmarks --save-baseline     # store the run in benchmarks/baseline.json
+#
+# Later runs are compared against the stored baseline; the exit status is 1
+# when a case got slower, heavier or larger than the tolerance allows.
+
+from benchmarks.synthetic import generate
+
+__all__ = ["generate"]
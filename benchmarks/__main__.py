@@ -0,0 +1,85 @@
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+from benchmarks import compare
+from benchmarks.synthetic import ensure_dataset
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DASHBOARD_DIR = os.path.join(REPO_ROOT, "dashboard")
+DATA_DIR = os.path.join(REPO_ROOT, "benchmarks", ".data")
+BASELINE_PATH = os.path.join(REPO_ROOT, "benchmarks", "baseline.json")
+
+
+def run_worker(data_base, repeat, cases, backend, work_dir):
+    # One fresh worker process per dataset, so import time and memory are measured cleanly
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [REPO_ROOT, env.get("PYTHONPATH")]))
+    env["CROP_DATA_BACKEND"] = backend
+    env["CROP_MAP_WARMUP"] = "0"
+    env["CROP_SQLITE_PATH"] = os.path.join(work_dir, "crop_data.sqlite")
+    if data_base is not None:
+        env["CROP_DATA_BASE"] = data_base
+    else:
+        env.pop("CROP_DATA_BASE", None)
+
+    output = os.path.join(work_dir, "result.json")
+    command = [sys.executable, "-m", "benchmarks.runner", "--repeat", str(repeat), "--output", output]
+    for case in cases or []:
+        command += ["--case", case]
+    subprocess.run(command, cwd=DASHBOARD_DIR, env=env, check=True)
+    return compare.load(output)
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks",
+                                     description="Benchmark the dashboard callbacks on the bundled and synthetic datasets.")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100],
+                        help="dataset scale factors; 1 is the bundled dataset (default: 1 10 100, 1000 needs several GB)")
+    parser.add_argument("--repeat", type=int, default=20, help="timed calls per case after the cold call")
+    parser.add_argument("--case", action="append", help="only run cases whose name starts with this (repeatable)")
+    parser.add_argument("--backend", choices=["dataframe", "sqlite"], default="dataframe")
+    parser.add_argument("--seed", type=int, default=0, help="synthetic data seed")
+    parser.add_argument("--output", help="write the results JSON here")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="baseline results to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative growth before a regression is reported")
+    args = parser.parse_args()
+
+    base = None
+    results = {"runs": {}}
+    for scale in args.scales:
+        data_base = None
+        if scale != 1:
+            if base is None:
+                sys.path.insert(0, DASHBOARD_DIR)
+                from data_loader import load_dataset
+                base, _ = load_dataset(os.path.join(DASHBOARD_DIR, "final_crop_data"))
+            data_base = ensure_dataset(base, DATA_DIR, scale, args.seed)
+
+        label = f"x{scale}"
+        print(f"Running {label} ({args.backend})", file=sys.stderr)
+        with tempfile.TemporaryDirectory() as work_dir:
+            results["runs"][label] = run_worker(data_base, args.repeat, args.case, args.backend, work_dir)
+
+    baseline = compare.load(args.baseline) if os.path.exists(args.baseline) and not args.save_baseline else None
+    print(compare.format_table(results, baseline))
+
+    if args.output:
+        compare.save(results, args.output)
+    if args.save_baseline:
+        compare.save(results, args.baseline)
+        print(f"\nSaved baseline to {args.baseline}")
+    elif baseline is not None:
+        found = compare.regressions(results, baseline, args.tolerance)
+        if found:
+            print(f"\n{len(found)} regression(s) over {args.tolerance:.0%}:")
+            print("\n".join(found))
+            sys.exit(1)
+        print(f"\nNo regressions over {args.tolerance:.0%} against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+# Benchmark reports and baseline comparison
+#
+# A results file holds one run per dataset label ("x1", "x10", ...), each
+# with the worker's meta data and per-case measurements. Comparing against a
+# baseline flags every case whose median latency, peak memory or payload size
+# grew by more than the tolerance.
+
+import json
+
+# Measurements checked against the baseline: (key, label)
+CHECKED = [("p50_ms", "p50"), ("peak_kb", "peak memory"), ("payload_bytes", "payload")]
+
+# Latencies below this are too noisy to compare
+MIN_LATENCY_MS = 1.0
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def save(results, path):
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2)
+
+
+def regressions(current, baseline, tolerance=0.25):
+    # Human readable lines for every measurement over (1 + tolerance) x its baseline
+    found = []
+    for label, run in current["runs"].items():
+        base_run = baseline.get("runs", {}).get(label)
+        if base_run is None:
+            continue
+        for name, case in run["cases"].items():
+            base_case = base_run["cases"].get(name)
+            if base_case is None:
+                continue
+            for key, what in CHECKED:
+                old, new = base_case[key], case[key]
+                if key == "p50_ms" and max(old, new) < MIN_LATENCY_MS:
+                    continue
+                if old > 0 and new > old * (1 + tolerance):
+                    found.append(f"{label} {name}: {what} {old} -> {new} ({new / old:.2f}x)")
+    return found
+
+
+def format_table(current, baseline=None):
+    lines = []
+    for label, run in current["runs"].items():
+        meta = run["meta"]
+        lines.append(f"\n{label}: {meta['rows']} rows, {meta['regions']} regions, {meta['crops']} crops, "
+                     f"{meta['years']} years ({meta['backend']}); import {meta['import_seconds']} s, "
+                     f"max RSS {meta['max_rss_mb']} MB")
+        lines.append(f"{'case':40} {'cold ms':>9} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} "
+                     f"{'peak KB':>10} {'payload KB':>11} {'json ms':>8} {'vs base':>8}")
+        base_cases = (baseline or {}).get("runs", {}).get(label, {}).get("cases", {})
+        for name, case in run["cases"].items():
+            ratio = ""
+            if name in base_cases and base_cases[name]["p50_ms"] > 0:
+                ratio = f"{case['p50_ms'] / base_cases[name]['p50_ms']:.2f}x"
+            lines.append(f"{name:40} {case['cold_ms']:9.1f} {case['p50_ms']:9.1f} {case['p90_ms']:9.1f} "
+                         f"{case['p99_ms']:9.1f} {case['peak_kb']:10.0f} {case['payload_bytes'] / 1024:11.1f} "
+                         f"{case.get('serialize_ms', 0):8.1f} {ratio:>8}")
+    return "\n".join(lines)
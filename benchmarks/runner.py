@@ -0,0 +1,174 @@
+# Benchmark worker: imports the dashboard and times its callbacks
+#
+# Run by `python -m benchmarks` in a fresh process per dataset, with the
+# dashboard/ folder as working directory and CROP_DATA_BASE pointing at the
+# dataset. Every case is called once cold, then `repeat` more times for the
+# latency distribution; one extra call under tracemalloc gives the peak
+# Python memory, and the JSON-encoded return value gives the payload size and
+# the time Dash spends encoding it.
+
+import argparse
+import json
+import os
+import platform
+import resource
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+
+def build_cases():
+    # (name, function, args) for every dashboard callback on the full table and on a subset
+    import core
+    import dashboard
+    import exports
+    import tab1_yield
+    import tab4_statistics
+    import tab5_choropleth
+    import tab6_yield_map
+    import tab7_timeline
+
+    engine = core.engine
+    full = (None, None, [engine.min_year, engine.max_year])
+    # Subset: the five regions and two crops with the most rows, last ten years
+    cube = core.cube
+    subset = (sorted(cube.by_region['count'].nlargest(5).index), sorted(cube.by_crop['count'].nlargest(2).index),
+              [max(engine.min_year, engine.max_year - 9), engine.max_year])
+    metric, year = tab5_choropleth.TAB5_METRICS[0], engine.max_year
+    # The same selections as the `shared-filters` store holds them
+    full_filters, subset_filters = core.filter_cache.normalize(*full), core.filter_cache.normalize(*subset)
+
+    def export_bytes(fmt, regions, crops, years):
+        return sum(len(chunk) for chunk in exports.stream(engine.filter(regions, crops, years), fmt))
+
+    def filtered_rows(filter, regions, crops, years):
+        return len(filter(regions, crops, years))
+
+    cases = [
+        # Filtering the subset rows, then serving them from the filter cache (repeat calls are hits)
+        ("filter/subset", filtered_rows, (engine.filter, *subset)),
+        ("filter_cache/subset", filtered_rows, (core.filter_cache.filter, *subset)),
+        ("update_yield_graph/line/all", tab1_yield.update_yield_graph, ("line", full_filters, "plotly_white", None)),
+        ("update_yield_graph/bar/subset", tab1_yield.update_yield_graph, ("bar", subset_filters, "plotly_white", None)),
+        # Partial updates sent instead of the figure for a theme or chart type change
+        ("theme_patch", core.theme_patch, ("plotly",)),
+        ("chart_type_patch", tab1_yield.chart_type_patch, ("bar", engine.crops)),
+        ("update_summary_cards/all", dashboard.update_summary_cards, (full_filters,)),
+        ("update_summary_cards/subset", dashboard.update_summary_cards, (subset_filters,)),
+    ]
+    for tab in range(1, 8):
+        cases.append((f"render_tabs/tab-{tab}/all", dashboard.render_tabs, (f"tab-{tab}", full_filters, "plotly_white")))
+    for tab in (2, 3, 4):
+        cases.append((f"render_tabs/tab-{tab}/subset", dashboard.render_tabs, (f"tab-{tab}", subset_filters, "plotly_white")))
+    cases += [
+        # Cold render bypasses the tab 5 cache; the callback itself is served from it after the first call
+        ("update_tab5_folium_map/render", tab5_choropleth.render_tab5_map, ((metric, year, core.map_version),)),
+        ("update_tab5_folium_map/cached", tab5_choropleth.tab5_cache.get_or_render,
+         ((metric, year, core.map_version), lambda: tab5_choropleth.render_tab5_map((metric, year, core.map_version)))),
+        # Tab 6 data-only update (hideout and markers)
+        ("update_yield_map/all", tab6_yield_map.update_yield_map, (year, None, full_filters)),
+        ("update_yield_map/subset", tab6_yield_map.update_yield_map, (year, subset[1], subset_filters)),
+        # Tab 7 frames (the former update_map callback now runs in the browser)
+        ("build_map_frames", tab7_timeline.build_map_frames, (engine.crops[0],)),
+        # Body of the streamed /download/filtered response
+        ("export/csv/all", export_bytes, ("csv", *full)),
+        ("export/csv.gz/all", export_bytes, ("csv.gz", *full)),
+        ("export/parquet/all", export_bytes, ("parquet", *full)),
+        ("export/csv/subset", export_bytes, ("csv", *subset)),
+        ("update_outlier_summary/zscore", tab4_statistics.update_outlier_summary, ("zscore", "global", 0, 2, full_filters)),
+        ("update_outlier_summary/mad-rolling", tab4_statistics.update_outlier_summary, ("mad", "crop_region", 5, 3.5, full_filters)),
+    ]
+    return cases
+
+
+def payload_bytes(value):
+    # Size of the response body Dash would send for this return value
+    from plotly.io.json import to_json_plotly
+    return len(to_json_plotly(value).encode('utf-8'))
+
+
+def run_case(func, args, repeat):
+    start = time.perf_counter()
+    result = func(*args)
+    cold = time.perf_counter() - start
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    func(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    # Encoding the response body, as Dash does after the callback returns
+    start = time.perf_counter()
+    payload = payload_bytes(result)
+    serialize = time.perf_counter() - start
+
+    ms = np.array(timings) * 1000
+    return {
+        "cold_ms": round(cold * 1000, 3),
+        "n": repeat,
+        "mean_ms": round(float(ms.mean()), 3),
+        "min_ms": round(float(ms.min()), 3),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p90_ms": round(float(np.percentile(ms, 90)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "max_ms": round(float(ms.max()), 3),
+        "peak_kb": round(peak / 1024, 1),
+        "payload_bytes": payload,
+        "serialize_ms": round(serialize * 1000, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the dashboard callbacks in this process.")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--case", action="append", help="only run cases whose name starts with this (repeatable)")
+    parser.add_argument("--output", required=True)
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.getcwd())
+    # Cold timings include the lazy loads a first request pays for; no warm-up thread competing either
+    os.environ.setdefault("CROP_WARMUP", "0")
+    start = time.perf_counter()
+    import core
+    import dashboard  # registers the tab callbacks
+    import_seconds = time.perf_counter() - start
+
+    # Callbacks run as on their initial call (dash.ctx set, nothing triggered)
+    from dash._callback_context import context_value
+    from dash._utils import AttributeDict
+    context_value.set(AttributeDict(triggered_inputs=[]))
+
+    results = {}
+    for name, func, case_args in build_cases():
+        if args.case and not any(name.startswith(prefix) for prefix in args.case):
+            continue
+        results[name] = run_case(func, case_args, args.repeat)
+        print(f"  {name}: p50 {results[name]['p50_ms']} ms", file=sys.stderr)
+
+    meta = {
+        "data_path": os.path.abspath(core.DATA_PATH),
+        "backend": core.DATA_BACKEND,
+        "rows": len(core.engine),
+        "regions": len(core.engine.regions),
+        "crops": len(core.engine.crops),
+        "years": core.engine.max_year - core.engine.min_year + 1,
+        "import_seconds": round(import_seconds, 3),
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+    }
+    with open(args.output, "w") as f:
+        json.dump({"meta": meta, "cases": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+# Synthetic crop yield datasets for the benchmarks
+#
+# Scales the bundled dataset by a factor spread evenly over regions, crops and
+# years (cube root each), so 10x gives about 10 times the rows. Every
+# synthetic (region, crop, year) cell copies the rows of a real template cell,
+# keeping the real sparsity and duplicate rows per cell, with the measures
+# jittered per row. The first regions and crops keep their real names, so the
+# maps still find their geometry; the rest are numbered copies.
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from etl import formats
+
+MEASURES = ['rainfall_mm', 'avg_temp_c', 'pesticide_t']
+
+# Bump when the generated data changes so cached files are rebuilt
+GENERATOR_VERSION = 1
+
+
+def _names(real, count):
+    return [real[i] if i < len(real) else f"{real[i % len(real)]} {i // len(real) + 1}" for i in range(count)]
+
+
+def generate(base, scale, seed=0):
+    # DataFrame with about `scale` times the rows of `base`, sorted by (crop, region, year)
+    rng = np.random.default_rng(seed)
+    region_codes, regions = pd.factorize(base['region'], sort=True)
+    crop_codes, crops = pd.factorize(base['crop'], sort=True)
+    years = base['year'].to_numpy(dtype=np.int64)
+    min_year, max_year = int(years.min()), int(years.max())
+    n_r, n_c, n_y = len(regions), len(crops), max_year - min_year + 1
+
+    # Template cells of the real data: rows sorted by cell, with start and count per cell
+    cell = (crop_codes * n_r + region_codes) * n_y + (years - min_year)
+    order = np.argsort(cell, kind='stable')
+    counts = np.bincount(cell, minlength=n_c * n_r * n_y)
+    starts = np.cumsum(counts) - counts
+
+    factor = scale ** (1 / 3)
+    s_r, s_c, s_y = (max(1, round(n * factor)) for n in (n_r, n_c, n_y))
+
+    # Synthetic grid in (crop, region, year) order, years ending at the real last year
+    c, r, y = (a.ravel() for a in np.meshgrid(np.arange(s_c), np.arange(s_r), np.arange(s_y), indexing='ij'))
+    template = ((c % n_c) * n_r + r % n_r) * n_y + (y - s_y) % n_y
+    per_cell = counts[template]
+
+    # Row positions into the real data: the template cell's rows, cell after cell
+    total = int(per_cell.sum())
+    first = np.repeat(starts[template] - (np.cumsum(per_cell) - per_cell), per_cell)
+    rows = order[np.arange(total) + first]
+
+    region_names = np.array(_names(list(regions), s_r), dtype=object)
+    crop_names = np.array(_names(list(crops), s_c), dtype=object)
+    out = pd.DataFrame({
+        'region': pd.Categorical(region_names[np.repeat(r, per_cell)]),
+        'crop': pd.Categorical(crop_names[np.repeat(c, per_cell)]),
+        'year': (max_year - s_y + 1 + np.repeat(y, per_cell)).astype('int16'),
+    })
+
+    jitter = rng.normal(1.0, 0.05, size=(total, 4)).clip(0.5, 1.5)
+    out['yield_hg_ha'] = np.maximum(1, np.round(base['yield_hg_ha'].to_numpy()[rows] * jitter[:, 0])).astype('int32')
+    out['yield_t_ha'] = (out['yield_hg_ha'] / 100).astype('float32')
+    for i, m in enumerate(MEASURES, start=1):
+        out[m] = (base[m].to_numpy(dtype='float64')[rows] * jitter[:, i]).round(2).astype('float32')
+    return out
+
+
+def dataset_path(data_dir, scale, seed=0):
+    # Base path (no extension) of a cached synthetic dataset
+    return os.path.join(data_dir, f"synthetic-x{scale}-seed{seed}-v{GENERATOR_VERSION}")
+
+
+def ensure_dataset(base, data_dir, scale, seed=0, log=print):
+    # Write the synthetic dataset once (Feather with pyarrow, else CSV) and return its base path
+    path = dataset_path(data_dir, scale, seed)
+    extension = ".feather" if formats.has_pyarrow() else ".csv"
+    if not os.path.exists(path + extension):
+        os.makedirs(data_dir, exist_ok=True)
+        df = generate(base, scale, seed)
+        # Write under a temporary name so an interrupted run leaves no truncated file
+        formats.write_dataset(df, path + ".tmp" + extension)
+        os.replace(path + ".tmp" + extension, path + extension)
+        log(f"Generated {path + extension}: {len(df)} rows, {df['region'].nunique()} regions, "
+            f"{df['crop'].nunique()} crops, {df['year'].nunique()} years")
+    return path
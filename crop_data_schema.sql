@@ -11,4 +11,9 @@ CREATE TABLE crop_yields (
     pesticide_t REAL
 );
 
-SELECT * FROM crop_yields; 
\ No newline at end of file
+-- Indexes used by the dashboard's region/crop/year filters
+CREATE INDEX idx_crop_yields_crop_region_year ON crop_yields (crop, region, year);
+CREATE INDEX idx_crop_yields_region_year ON crop_yields (region, year);
+CREATE INDEX idx_crop_yields_year ON crop_yields (year);
+
+SELECT * FROM crop_yields;
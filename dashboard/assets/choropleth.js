@@ -1,3 +1,11 @@
+// Standalone Leaflet choropleth (choropleth.html).
+// Reads the precomputed data of choropleth_shards.py: the manifest and the
+// simplified world geometry are fetched once, then only the (metric, year)
+// shard on screen; shards already seen are kept in memory. The regions are
+// restyled in place instead of rebuilding the layer.
+
+const MANIFEST_URL = new URL("choropleth/manifest.json", document.baseURI);
+
 const map = L.map('map', {
   center: [25, 0],
   zoom: 2,
@@ -18,84 +26,100 @@ const dataSelect = document.getElementById("dataSelect");
 const yearSlider = document.getElementById("yearSlider");
 const yearValue = document.getElementById("yearValue");
 
-let cropData = [];
+let manifest;
 let geoLayer;
+let regionIndex = {};                 // region name -> position in the shard values
+let current = {values: []};           // shard on screen
+const shards = new Map();             // "metric/year" -> shard promise
 
-Papa.parse("final_crop_data.csv", {
-  download: true,
-  header: true,
-  complete: function(results) {
-    cropData = results.data.map(d => ({
-      region: d.region,
-      year: parseInt(d.year),
-      yield_hg_ha: parseFloat(d.yield_hg_ha),
-      yield_t_ha: parseFloat(d.yield_t_ha),
-      rainfall_mm: parseFloat(d.rainfall_mm),
-      avg_temp_c: parseFloat(d.avg_temp_c),
-      pesticide_t: parseFloat(d.pesticide_t)
-    })).filter(d => d.region && !isNaN(d.year));
-    drawMap();
+function fetchJson(url) {
+  return fetch(url).then(res => {
+    if (!res.ok) throw new Error(`${url}: ${res.status}`);
+    return res.json();
+  });
+}
+
+function loadShard(metric, year) {
+  const key = `${metric}/${year}`;
+  if (!shards.has(key)) {
+    const path = manifest.shards.replace("{metric}", metric).replace("{year}", year);
+    shards.set(key, fetchJson(new URL(path, MANIFEST_URL)).catch(err => {
+      shards.delete(key);
+      throw err;
+    }));
   }
-});
+  return shards.get(key);
+}
+
+function getColor(val, min, max) {
+  const percent = max > min ? (val - min) / (max - min) : 0;
+  return percent < 0.2 ? '#ffffcc'
+       : percent < 0.4 ? '#a1dab4'
+       : percent < 0.6 ? '#41b6c4'
+       : percent < 0.8 ? '#2c7fb8'
+       : '#253494';
+}
+
+function valueOf(feature) {
+  const i = regionIndex[feature.properties.name];
+  return i === undefined ? null : current.values[i];
+}
+
+function style(feature) {
+  const val = valueOf(feature);
+  return {
+    fillColor: val !== null ? getColor(val, current.min, current.max) : '#ccc',
+    weight: 1,
+    color: '#000',
+    fillOpacity: 0.8
+  };
+}
 
 function drawMap() {
-  if (geoLayer) geoLayer.remove();
-
-  fetch("https://raw.githubusercontent.com/johan/world.geo.json/master/countries.geo.json")
-    .then(res => res.json())
-    .then(geojson => {
-      geojson.features = geojson.features.filter(
-        feature => feature.properties.name !== "Antarctica"
-      );
-
-      const year = parseInt(yearSlider.value);
-      const metric = dataSelect.value;
-      yearValue.textContent = year;
-
-      const regionMetricMap = {};
-      cropData.forEach(row => {
-        if (row.year === year && !isNaN(row[metric])) {
-          regionMetricMap[row.region] = row[metric];
-        }
-      });
+  if (!geoLayer) return;              // drawn once the geometry has loaded
+  const year = parseInt(yearSlider.value);
+  const metric = dataSelect.value;
+  yearValue.textContent = year;
+  loadShard(metric, year).then(shard => {
+    // A later selection may have been drawn while this shard was loading
+    if (metric !== dataSelect.value || year !== parseInt(yearSlider.value)) return;
+    current = shard;
+    geoLayer.setStyle(style);
+  }).catch(err => console.error(err));
+}
+
+fetchJson(MANIFEST_URL).then(loaded => {
+  manifest = loaded;
+  manifest.regions.forEach((region, i) => { regionIndex[region] = i; });
 
-      function getColor(val, min, max) {
-        const percent = (val - min) / (max - min);
-        return percent < 0.2 ? '#ffffcc'
-             : percent < 0.4 ? '#a1dab4'
-             : percent < 0.6 ? '#41b6c4'
-             : percent < 0.8 ? '#2c7fb8'
-             : '#253494';
-      }
-
-      const values = Object.values(regionMetricMap);
-      const min = Math.min(...values);
-      const max = Math.max(...values);
-
-      geoLayer = L.geoJson(geojson, {
-        style: feature => {
-          const region = feature.properties.name;
-          const val = regionMetricMap[region];
-          return {
-            fillColor: val !== undefined ? getColor(val, min, max) : '#ccc',
-            weight: 1,
-            color: '#000',
-            fillOpacity: 0.8
-          };
-        },
-        onEachFeature: (feature, layer) => {
-          const region = feature.properties.name;
-          const val = regionMetricMap[region];
-          layer.bindPopup(`<strong>${region}</strong><br>${dataSelect.options[dataSelect.selectedIndex].text}: ${val ?? 'No data'}`);
-        }
-      }).addTo(map);
-
-      map.fitBounds(geoLayer.getBounds(), {
-        padding: [20, 20],
-        maxZoom: 4
+  const years = manifest.years;
+  yearSlider.min = years[0];
+  yearSlider.max = years[years.length - 1];
+  yearSlider.value = years[years.length - 1];
+
+  return fetchJson(new URL(manifest.geometry, MANIFEST_URL));
+}).then(geojson => {
+  geojson.features = geojson.features.filter(
+    feature => feature.properties.name !== "Antarctica"
+  );
+  geoLayer = L.geoJson(geojson, {
+    style: style,
+    onEachFeature: (feature, layer) => {
+      // Bound once; the content follows the shard on screen
+      layer.bindPopup(() => {
+        const val = valueOf(feature);
+        return `<strong>${feature.properties.name}</strong><br>` +
+               `${dataSelect.options[dataSelect.selectedIndex].text}: ${val ?? 'No data'}`;
       });
-    });
-}
+    }
+  }).addTo(map);
+
+  map.fitBounds(geoLayer.getBounds(), {
+    padding: [20, 20],
+    maxZoom: 4
+  });
+  drawMap();
+});
 
 dataSelect.addEventListener("change", drawMap);
 yearSlider.addEventListener("input", drawMap);
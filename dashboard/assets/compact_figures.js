@@ -0,0 +1,58 @@
+// Decoder of the compact figures of compact_figures.py (CROP_COMPACT_FIGURES=1).
+// Rebuilds the per-point arrays (customdata, hovertext ...) the server sent as
+// typed-array and categorical columns; plotly.js reads the other typed arrays
+// ({dtype, bdata}) itself.
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    compactFigures: (function() {
+        const ARRAYS = {
+            i1: Int8Array, u1: Uint8Array, i2: Int16Array, u2: Uint16Array,
+            i4: Int32Array, u4: Uint32Array, f4: Float32Array, f8: Float64Array
+        };
+
+        function typed(spec) {
+            const bytes = Uint8Array.from(atob(spec.bdata), function(c) { return c.charCodeAt(0); });
+            return new ARRAYS[spec.dtype](bytes.buffer);
+        }
+
+        // Plain array of one column
+        function column(spec) {
+            if (spec.ctype === "categorical") {
+                return Array.from(typed(spec.codes), function(code) { return spec.categories[code]; });
+            }
+            return Array.from(typed(spec));
+        }
+
+        function points(spec) {
+            if (spec.ctype === "column") {
+                return column(spec.column);
+            }
+            const columns = spec.columns.map(column);
+            const n = columns.length ? columns[0].length : 0;
+            const rows = new Array(n);
+            for (let i = 0; i < n; i++) {
+                rows[i] = columns.map(function(values) { return values[i]; });
+            }
+            return rows;
+        }
+
+        return {
+            decode: function(figure) {
+                if (!figure) {
+                    return window.dash_clientside.no_update;
+                }
+                const data = figure.data.map(function(trace) {
+                    const decoded = Object.assign({}, trace);
+                    Object.keys(trace).forEach(function(field) {
+                        const value = trace[field];
+                        if (value && (value.ctype === "column" || value.ctype === "columns")) {
+                            decoded[field] = points(value);
+                        }
+                    });
+                    return decoded;
+                });
+                return Object.assign({}, figure, {data: data});
+            }
+        };
+    })()
+});
@@ -0,0 +1,17 @@
+// Client id for the background jobs of dashboard.py (see jobs.py): a new job
+// submitted by the same browser tab supersedes that tab's previous one.
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    jobs: {
+        // Fill the session client-id store once; later calls leave it unchanged
+        clientId: function(modified, clientId) {
+            if (clientId) {
+                return window.dash_clientside.no_update;
+            }
+            if (window.crypto && window.crypto.randomUUID) {
+                return window.crypto.randomUUID();
+            }
+            return Date.now().toString(36) + Math.random().toString(36).slice(2);
+        }
+    }
+});
@@ -0,0 +1,48 @@
+// Client-side styling for the "Interactive Yield Map" (tab 6).
+// The region geometry is loaded once by the dl.GeoJSON layer; a filter change
+// only sends its hideout ({values: {region: yield}, min, max, colors}) and the
+// functions below recolor the regions from it.
+
+window.dashExtensions = Object.assign({}, window.dashExtensions, {
+    tab6: (function() {
+        // Hideout of the last restyle, read by the tooltips bound when the layer was created
+        let current = {values: {}};
+
+        function rgb(hex) {
+            const n = parseInt(hex.slice(1), 16);
+            return [(n >> 16) & 255, (n >> 8) & 255, n & 255];
+        }
+
+        // Linear color scale through hideout.colors between hideout.min and hideout.max
+        function color(value, hideout) {
+            const colors = hideout.colors;
+            const span = hideout.max - hideout.min;
+            const t = span > 0 ? Math.min(1, Math.max(0, (value - hideout.min) / span)) : 0;
+            const position = t * (colors.length - 1);
+            const i = Math.min(Math.floor(position), colors.length - 2);
+            const a = rgb(colors[i]), b = rgb(colors[i + 1]);
+            const f = position - i;
+            return "rgb(" + a.map(function(c, k) { return Math.round(c + (b[k] - c) * f); }).join(",") + ")";
+        }
+
+        return {
+            style: function(feature, context) {
+                const hideout = context.hideout;
+                current = hideout;
+                const value = hideout.values[feature.properties.name];
+                if (value === undefined) {
+                    return {fillColor: hideout.missing, color: "#555555", weight: 1, fillOpacity: 0.7, dashArray: "5, 5"};
+                }
+                return {fillColor: color(value, hideout), color: "#555555", weight: 1, fillOpacity: 0.7};
+            },
+
+            onEachFeature: function(feature, layer) {
+                layer.bindTooltip(function() {
+                    const value = current.values[feature.properties.name];
+                    return "<b>Region:</b> " + feature.properties.name + "<br><b>Avg Yield (t/ha):</b> " +
+                        (value === undefined ? "No data" : value.toFixed(2));
+                }, {sticky: true});
+            }
+        };
+    })()
+});
@@ -0,0 +1,43 @@
+// Client-side playback for the "Crop Yield Over Time Map" (tab 7).
+// The server sends every year frame of the selected crop once (tab7-frames store);
+// stepping the timeline and drawing a frame happen here without a server round trip.
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    tab7: {
+        // Advance the year slider on every interval tick, looping back to the start
+        nextYear: function(n_intervals, frames, currentYear) {
+            if (!frames || !frames.years.length) {
+                return window.dash_clientside.no_update;
+            }
+            const years = frames.years;
+            return years[(years.indexOf(currentYear) + 1) % years.length];
+        },
+
+        // Build the choropleth figure of one year from the cached frames
+        drawFrame: function(year, frames) {
+            if (!frames) {
+                return window.dash_clientside.no_update;
+            }
+            const locations = [];
+            const z = [];
+            const index = frames.years.indexOf(year);
+            if (index >= 0) {
+                frames.values[index].forEach(function(value, j) {
+                    if (value !== null) {
+                        locations.push(frames.regions[j]);
+                        z.push(value);
+                    }
+                });
+            }
+            const trace = Object.assign({}, frames.trace, {locations: locations, z: z, hovertext: locations});
+            const layout = Object.assign({}, frames.layout, {title: {text: frames.crop + " Yield in " + year}});
+            return {data: [trace], layout: layout};
+        },
+
+        // Even clicks = play, odd = pause
+        togglePlay: function(n_clicks) {
+            const paused = n_clicks % 2 !== 0;
+            return [paused, paused ? "Play Timeline" : "Pause Timeline"];
+        }
+    }
+});
@@ -0,0 +1,102 @@
+# Precomputed data shards for the standalone Leaflet choropleth (assets/choropleth.html)
+#
+# Offline step that writes, for every metric and year, the per-region mean of
+# the metric (the same rollup cube aggregation as the tab 5 choropleth) as a
+# small JSON shard, plus a manifest with the region list, the years and the
+# path of the simplified world geometry (see geometry_lod.py). The page loads
+# the manifest and the geometry once and then only the shard it shows, so it
+# no longer downloads and parses the whole CSV in the browser.
+#
+# The shards are computed on a process pool. The manifest holds the dataset
+# fingerprint; re-running skips the work when the dataset did not change.
+#
+#   python choropleth_shards.py           # build missing or stale shards
+#   python choropleth_shards.py --force   # rebuild every shard
+
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+from data_loader import load_dataset
+from geometry_lod import fingerprint, path_for_zoom
+from rollup import MEASURES, RollupCube, cells_from_frame
+
+DATA_BASE = "final_crop_data"
+OUTPUT_DIR = "assets/choropleth"
+MANIFEST_NAME = "manifest.json"
+# Bumped when the shard format changes, so existing shards are rebuilt
+SHARD_VERSION = 1
+# The page zooms between 2 and 5; one geometry level covers it
+GEOMETRY_ZOOM = 4
+
+_cube = None
+
+
+def _load_cube(base):
+    # Per worker process: the rollup cube of the dataset
+    global _cube
+    df, _ = load_dataset(base, log=lambda message: None)
+    _cube = RollupCube(cells_from_frame(df))
+
+
+def shard_path(metric, year, output_dir=OUTPUT_DIR):
+    return os.path.join(output_dir, metric, f"{year}.json")
+
+
+def write_shard(metric, year, regions, output_dir):
+    # Mean of the metric per region in one year, aligned with `regions` (null = no data)
+    means = _cube.mean('region', metric, years=[year, year]).dropna()
+    values = [round(float(means[r]), 3) if r in means.index else None for r in regions]
+    present = [v for v in values if v is not None]
+    shard = {"metric": metric, "year": year, "values": values,
+             "min": min(present) if present else None, "max": max(present) if present else None}
+    path = shard_path(metric, year, output_dir)
+    with open(path, "w") as f:
+        json.dump(shard, f, separators=(",", ":"))
+    return os.path.getsize(path)
+
+
+def build_shards(base=DATA_BASE, output_dir=OUTPUT_DIR, workers=None, force=False, log=print):
+    df, data_path = load_dataset(base, log=log)
+    data_hash = fingerprint(data_path)
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    if not force and os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        if manifest.get("data_sha256") == data_hash and manifest.get("version") == SHARD_VERSION:
+            log("Shards up to date")
+            return manifest
+
+    regions = sorted(df['region'].dropna().unique().astype(str))
+    years = list(range(int(df['year'].min()), int(df['year'].max()) + 1))
+    metrics = [metric for metric in MEASURES for _ in years]
+    for metric in MEASURES:
+        os.makedirs(os.path.join(output_dir, metric), exist_ok=True)
+    del df
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_load_cube, initargs=(base,)) as pool:
+        sizes = list(pool.map(write_shard, metrics, years * len(MEASURES), repeat(regions), repeat(output_dir),
+                              chunksize=8))
+
+    # Paths in the manifest are relative to it
+    geometry = os.path.relpath(path_for_zoom(GEOMETRY_ZOOM), output_dir).replace(os.sep, "/")
+    manifest = {"version": SHARD_VERSION, "data": data_path, "data_sha256": data_hash,
+                "metrics": MEASURES, "years": years, "regions": regions, "geometry": geometry,
+                "shards": "{metric}/{year}.json"}
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    log(f"Wrote {len(sizes)} shards ({sum(sizes)} bytes) for {len(MEASURES)} metrics x {len(years)} years "
+        f"to {output_dir}")
+    return manifest
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write per-(metric, year) data shards for assets/choropleth.html.")
+    parser.add_argument("--data", default=DATA_BASE, help="dataset path without extension")
+    parser.add_argument("--output-dir", default=OUTPUT_DIR)
+    parser.add_argument("--workers", type=int, help="worker processes (default: one per CPU)")
+    parser.add_argument("--force", action="store_true", help="rebuild every shard even if they are up to date")
+    args = parser.parse_args()
+    build_shards(args.data, args.output_dir, args.workers, args.force)
@@ -0,0 +1,124 @@
+# Opt-in compact encoding of the large dashboard figures (CROP_COMPACT_FIGURES=1)
+#
+# Plotly already sends numeric NumPy arrays as base64 typed arrays, but
+# per-point arrays of Python objects (the hover columns plotly express packs
+# into customdata: crop, region, year ...) still travel as JSON text, one
+# string per point. Here every such array is split into columns: numeric
+# columns become typed arrays of the smallest exact dtype and string columns a
+# list of their distinct values plus typed-array codes. The encoded figure is
+# sent to a dcc.Store next to the graph, and a clientside callback
+# (assets/compact_figures.js) rebuilds the arrays and hands the figure to the
+# graph, so nothing changes for plotly.js.
+#
+# Dash encodes responses through plotly.io.json, with orjson when it is
+# installed; install it with this option for the fastest encoding.
+
+import base64
+import os
+
+import numpy as np
+from dash import dcc, Input, Output, ClientsideFunction
+
+COMPACT_FIGURES = os.environ.get("CROP_COMPACT_FIGURES", "0") == "1"
+
+# Trace fields holding per-point values
+POINT_FIELDS = ("customdata", "hovertext", "text", "ids")
+INT_DTYPES = (np.int8, np.uint8, np.int16, np.uint16, np.int32, np.uint32)
+
+
+def _typed(values):
+    # Plotly typed-array spec; dtype names as plotly.js expects them (i1, u2, f4 ...)
+    values = np.ascontiguousarray(values)
+    return {"dtype": values.dtype.str[1:], "bdata": base64.b64encode(values.tobytes()).decode("ascii")}
+
+
+def _smallest_int(values):
+    lo, hi = (int(values.min()), int(values.max())) if len(values) else (0, 0)
+    for dtype in INT_DTYPES:
+        info = np.iinfo(dtype)
+        if info.min <= lo and hi <= info.max:
+            return values.astype(dtype)
+    return None
+
+
+def _column(values):
+    # One column of an object array: typed array, or distinct values plus codes
+    numeric = None
+    if not any(isinstance(v, (str, bytes, bool, np.bool_)) for v in values[:1]):
+        try:
+            numeric = values.astype(np.float64)
+        except (TypeError, ValueError):
+            pass
+    if numeric is not None:
+        if np.all(np.isfinite(numeric)) and np.array_equal(numeric, np.round(numeric)):
+            ints = _smallest_int(numeric.astype(np.int64))
+            if ints is not None:
+                return _typed(ints)
+        single = numeric.astype(np.float32)
+        exact = np.array_equal(single, numeric, equal_nan=True)
+        return _typed(single if exact else numeric)
+
+    categories, codes = np.unique(values.astype(str), return_inverse=True)
+    return {"ctype": "categorical", "categories": categories.tolist(),
+            "codes": _typed(_smallest_int(codes.ravel()))}
+
+
+def _encode_points(values):
+    # Per-point values as compact columns; None when they are not worth encoding
+    if isinstance(values, dict) or np.ndim(values) == 0:
+        return None                             # already a typed array, or a scalar
+    values = np.asarray(values, dtype=object)
+    if values.ndim == 1:
+        return {"ctype": "column", "column": _column(values)}
+    if values.ndim == 2:
+        return {"ctype": "columns", "columns": [_column(values[:, i]) for i in range(values.shape[1])]}
+    return None
+
+
+def encode(fig):
+    # The figure as a JSON-ready dict with the per-point object arrays encoded
+    figure = fig.to_plotly_json()
+    for trace in figure["data"]:
+        for field in POINT_FIELDS:
+            if field in trace:
+                encoded = _encode_points(trace[field])
+                if encoded is not None:
+                    trace[field] = encoded
+    return figure
+
+
+# Wiring: the graph, its data store and the decoding clientside callback
+
+def _store_id(graph_id):
+    if isinstance(graph_id, dict):
+        return {**graph_id, "type": graph_id["type"] + "-data"}
+    return graph_id + "-data"
+
+
+def graph(graph_id, figure=None, **kwargs):
+    # dcc.Graph showing `figure`; with compact figures, plus the store it is decoded from
+    if not COMPACT_FIGURES:
+        return dcc.Graph(id=graph_id, figure=figure, **kwargs)
+    store = dcc.Store(id=_store_id(graph_id), data=encode(figure) if figure is not None else None)
+    return [dcc.Graph(id=graph_id, **kwargs), store]
+
+
+def output(graph_id):
+    # Callback output receiving the value() of a figure
+    if not COMPACT_FIGURES:
+        return Output(graph_id, "figure")
+    return Output(_store_id(graph_id), "data")
+
+
+def value(fig):
+    return encode(fig) if COMPACT_FIGURES else fig
+
+
+def register(app, graph_id):
+    # Decode in the browser (nothing to do without compact figures); pattern ids pass MATCH
+    if COMPACT_FIGURES:
+        app.clientside_callback(
+            ClientsideFunction(namespace="compactFigures", function_name="decode"),
+            Output(graph_id, "figure"),
+            Input(_store_id(graph_id), "data")
+        )
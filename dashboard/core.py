@@ -0,0 +1,176 @@
+# App, dataset and the state shared by all tabs
+#
+# Imported first by dashboard.py and by every tab module (tab1_yield.py ...
+# tab7_timeline.py). Only what the first page view needs is built here; the
+# heavier per-tab dependencies and precomputations are Lazy (see startup.py).
+
+import os
+
+from startup import Lazy, load, timed
+
+import dash
+from dash import html, Patch
+import dash_bootstrap_components as dbc
+from flask import request
+
+# One step per module in the startup report; numpy and pandas first, so the data
+# modules below are timed without them
+load("numpy")
+load("pandas")
+with timed("data_loader"):
+    from data_loader import find_dataset, load_dataset
+with timed("filter_engine"):
+    from filter_engine import FilterEngine
+with timed("shared_store"):
+    import shared_store
+with timed("rollup"):
+    from rollup import RollupCube
+with timed("selection"):
+    from selection import FilterCache
+with timed("outliers"):
+    from outliers import OutlierEngine
+with timed("sqlite_backend"):
+    from sqlite_backend import SQLiteBackend
+with timed("geometry_lod"):
+    import geometry_lod
+with timed("map_routes"):
+    from map_routes import MapStore
+with timed("jobs"):
+    from jobs import JobQueue, DONE, FAILED, CANCELLED
+with timed("instrumentation"):
+    from instrumentation import instrument_callbacks, metrics, register_endpoint
+
+# The data generated after the ETL stage of this project (Feather/Parquet if built, else CSV).
+# CROP_DATA_BASE points at another dataset (path without extension), e.g. the benchmark data
+DATA_BASE = os.environ.get("CROP_DATA_BASE", "final_crop_data")
+DATA_PATH = find_dataset(DATA_BASE)
+
+# Version of the loaded dataset, part of the cached engine stores and map keys
+data_stat = os.stat(DATA_PATH)
+data_version = f"{data_stat.st_size}-{data_stat.st_mtime_ns}"
+
+# Initial zoom of the Folium maps; picks the simplified geometry level (see geometry_lod.py)
+MAP_ZOOM = 2
+
+# Bump when the rendered map documents change (map code, tiles, colormap ...)
+MAP_RENDER_VERSION = 1
+
+# Version of a rendered map: dataset, geometry level content and renderer. Part of
+# the cached map keys and of the ETags, so a rebuild of either invalidates old maps
+map_version = f"{data_version}-{geometry_lod.version_for_zoom(MAP_ZOOM)}-r{MAP_RENDER_VERSION}"
+
+def load_geo_index():
+    # Region name -> feature, centroid and bounds of the map geometry (read-only). Callbacks
+    # pass per-request property overlays instead of writing into the shared features
+    path = geometry_lod.path_for_zoom(MAP_ZOOM)
+    if SHARED_STORE:
+        return shared_store.load_geo_index(SHARED_STORE, path)
+    return load("geo_index").GeoIndex.from_file(path)
+
+# Loaded once, on first use by the map tabs or by the warm-up
+geo_index = Lazy("region geometry index", load_geo_index)
+
+# App setup with error suppression; assets/choropleth.js belongs to the standalone choropleth.html page
+app = dash.Dash(__name__, external_stylesheets=[dbc.themes.PULSE], suppress_callback_exceptions=True,
+                assets_ignore=r"choropleth\.js")
+app.title = "Crop Yield Dashboard"
+
+# Flask server for multi-worker deployments, e.g. `gunicorn -w 4 --threads 4 dashboard:server`
+server = app.server
+
+# Time every @app.callback (filter / figure / serialize phases, payload size,
+# exceptions) and serve the numbers in Prometheus format on /metrics
+instrument_callbacks(app)
+register_endpoint(server)
+
+# Assign colors to crops
+crop_colors = {
+    "Maize": "#FDB183", "Potatoes": "#C44E52", "Rice, paddy": "#55A868",
+    "Sorghum": "#8172B2", "Soybeans": "#CCB974", "Sweet potatoes": "#64B5CD",
+    "Wheat": "#8C564B", "Casava": "#FF9896", "Yams": "#9467BD"
+}
+
+def theme_patch(theme):
+    # Partial update of a figure on screen that only swaps its template (theme-toggle)
+    patch = Patch()
+    patch["layout"]["template"] = load("plotly.io").templates[theme].to_plotly_json()
+    return patch
+
+# Analysis, precomputed
+
+def read_frame():
+    with timed("load dataset"):
+        df, _ = load_dataset(DATA_BASE)
+    return df
+
+def load_frame():
+    # The dataset with its derived columns, as the in-memory backends hold it
+    df = read_frame()
+    # Detect outliers in yield values (kept on the exported rows): tab 4's default
+    # setting, |global z-score| > 2
+    df['is_outlier'] = OutlierEngine(df).flags('zscore', 'global', 0, 2.0)
+    return df
+
+# Storage backend shared by all callbacks: the in-memory indexed filter engine, or an
+# on-disk SQLite store with CROP_DATA_BACKEND=sqlite. With CROP_SHARED_STORE=<dir> the
+# in-memory table is mapped read-only from <dir>, one copy for all worker processes
+DATA_BACKEND = os.environ.get("CROP_DATA_BACKEND", "dataframe")
+SHARED_STORE = os.environ.get("CROP_SHARED_STORE") if DATA_BACKEND != "sqlite" else None
+with timed(f"{DATA_BACKEND} backend"):
+    if DATA_BACKEND == "sqlite":
+        # The store computes is_outlier in its queries, so it is built from the plain dataset
+        engine = SQLiteBackend.open(os.environ.get("CROP_SQLITE_PATH", "crop_data.sqlite"), data_version, read_frame)
+    elif SHARED_STORE:
+        engine = shared_store.open_engine(SHARED_STORE, data_version, lambda: FilterEngine(load_frame()))
+    else:
+        engine = FilterEngine(load_frame())
+
+# Rollup cube per (crop, region, year) for summary cards and group-by charts; the
+# SQLite backend reads the cells it aggregated when its store was built
+with timed("rollup cube"):
+    cube = shared_store.map_cube(SHARED_STORE) if SHARED_STORE else RollupCube(engine.rollup_cells())
+
+# Rows of the recent filter selections, keyed on the normalized selection the
+# `shared-filters` store holds (see selection.py), bounded by entries and bytes
+filter_cache = FilterCache(
+    engine,
+    max_entries=int(os.environ.get("CROP_FILTER_CACHE_ENTRIES", 32)),
+    max_bytes=int(os.environ.get("CROP_FILTER_CACHE_MB", 64)) * 1024 * 1024
+)
+metrics.register_cache("filter", filter_cache)
+
+# Grouped / rolling outlier scores for tab 4, computed per method and window on demand.
+# Reads only the columns it scores, so the SQLite backend never loads the full table
+outlier_engine = Lazy("outlier engine", lambda: OutlierEngine(engine.columns(OutlierEngine.COLUMNS)))
+
+# The tab 5 map renders run on a bounded background queue and its callback
+# polls it every JOB_POLL_MS; the rendered maps are kept in the map store
+JOB_POLL_MS = 500
+job_queue = JobQueue(max_workers=int(os.environ.get("CROP_JOB_WORKERS", 2)))
+
+def job_slot(client, name):
+    # Before the client id store is filled in, fall back to the client address
+    return (client or request.remote_addr, name)
+
+def job_outputs(job, result):
+    # (result, status, poll disabled) for a callback polling `job`; result() builds the finished output
+    if job is None or job.state == CANCELLED:
+        return dash.no_update, None, True
+    if job.state == DONE:
+        return result(), None, True
+    if job.state == FAILED:
+        return dash.no_update, html.Div(f"Error: {job.error}", className="text-danger"), True
+    return dash.no_update, html.Div([
+        html.Small(job.message, className="text-muted"),
+        dbc.Progress(value=round(job.fraction * 100), striped=True, animated=True, style={"height": "6px"})
+    ]), False
+
+# The Folium documents of tab 5 are served as cacheable GET responses (/maps/...):
+# weak ETag / Last-Modified from the map version, gzip (brotli if installed), and a
+# disk cache shared by all workers, bounded by CROP_MAP_CACHE_MB
+map_store = MapStore(
+    os.environ.get("CROP_MAP_CACHE_DIR", ".map_cache"),
+    int(os.environ.get("CROP_MAP_CACHE_MB", 256)) * 1024 * 1024,
+    map_version,
+    max(data_stat.st_mtime, os.stat(geometry_lod.path_for_zoom(MAP_ZOOM)).st_mtime)
+)
@@ -0,0 +1,67 @@
+# Dataset loader for the dashboard
+#
+# Prefers the columnar files written by the ETL (Feather, then Parquet) with
+# categorical region/crop, int16 year and float32 measures, and falls back to
+# the CSV when they are missing or pyarrow is not installed. The CSV is read
+# with the same compact dtypes. Load time and resident memory are reported.
+
+import importlib.util
+import os
+import time
+
+import pandas as pd
+
+# Same compact dtypes as the ETL's binary outputs (etl/formats.py)
+CSV_DTYPES = {
+    'region': 'category',
+    'crop': 'category',
+    'year': 'int16',
+    'yield_hg_ha': 'int32',
+    'yield_t_ha': 'float32',
+    'rainfall_mm': 'float32',
+    'avg_temp_c': 'float32',
+    'pesticide_t': 'float32',
+}
+
+
+def resident_memory_mb():
+    # Current resident set size of this process (Linux), peak RSS elsewhere
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 ** 2
+    except (OSError, ValueError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def candidate_paths(base):
+    paths = []
+    if importlib.util.find_spec("pyarrow") is not None:
+        paths += [base + ".feather", base + ".parquet"]
+    return paths + [base + ".csv"]
+
+
+def find_dataset(base="final_crop_data"):
+    # Path load_dataset() reads: the first candidate that exists
+    for path in candidate_paths(base):
+        if os.path.exists(path):
+            return path
+    raise FileNotFoundError(f"No dataset found for {base} (.feather/.parquet/.csv)")
+
+
+def load_dataset(base="final_crop_data", log=print):
+    # Returns (DataFrame, path it was loaded from)
+    path = find_dataset(base)
+    rss_before = resident_memory_mb()
+    start = time.perf_counter()
+    if path.endswith(".feather"):
+        df = pd.read_feather(path)
+    elif path.endswith(".parquet"):
+        df = pd.read_parquet(path)
+    else:
+        df = pd.read_csv(path, dtype=CSV_DTYPES)
+    elapsed = time.perf_counter() - start
+    log(f"Loaded {path}: {len(df)} rows in {elapsed * 1000:.0f} ms, "
+        f"{df.memory_usage(deep=True).sum() / 1024 ** 2:.1f} MB in memory, "
+        f"RSS {resident_memory_mb():.0f} MB (+{resident_memory_mb() - rss_before:.0f} MB)")
+    return df, path
@@ -0,0 +1,92 @@
+# Point budgets for the large charts (tab 1 line chart, tab 2 scatters)
+#
+# Below MAX_POINTS rows the charts are drawn as before. Above it the time
+# series are decimated per trace with largest-triangle-three-buckets (LTTB)
+# and drawn with WebGL; the scatters switch to WebGL and, above
+# DENSITY_POINTS rows, to a 2D-binned density grid. Zooming re-renders the
+# visible range at full detail again once it fits the budget (relayout
+# callbacks in dashboard.py), so response size stays bounded by the budget
+# rather than the row count.
+
+import os
+
+import numpy as np
+
+MAX_POINTS = int(os.environ.get("CROP_MAX_POINTS", 5000))
+DENSITY_POINTS = int(os.environ.get("CROP_DENSITY_POINTS", 4 * MAX_POINTS))
+DENSITY_BINS = 100
+
+
+def lttb(x, y, n_out):
+    # Indices of the n_out points kept by largest-triangle-three-buckets; x must be sorted
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype='float64')
+    y = np.asarray(y, dtype='float64')
+
+    # Interior buckets (first and last points are always kept) and their averages
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    sizes = np.diff(edges)
+    avg_x = np.add.reduceat(x[1:n - 1], edges[:-1] - 1) / sizes
+    avg_y = np.add.reduceat(y[1:n - 1], edges[:-1] - 1) / sizes
+    next_x = np.r_[avg_x[1:], x[-1]]
+    next_y = np.r_[avg_y[1:], y[-1]]
+
+    keep = np.empty(n_out, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i, (lo, hi) in enumerate(zip(edges[:-1], edges[1:])):
+        # Point of the bucket forming the largest triangle with the last kept point and the next bucket's average
+        area = np.abs((x[a] - next_x[i]) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (next_y[i] - y[a]))
+        a = lo + int(np.argmax(area))
+        keep[i + 1] = a
+    return keep
+
+
+def decimate(df, by, y, max_points):
+    # Rows of df kept by LTTB within each `by` group, in their plotting order
+    groups = df.groupby(by, observed=True, sort=False).indices
+    budget = max(3, max_points // max(1, len(groups)))
+    positions = []
+    for rows in groups.values():
+        values = df[y].to_numpy()[rows]
+        positions.append(rows[lttb(np.arange(len(rows)), values, budget)])
+    return df.iloc[np.sort(np.concatenate(positions))] if positions else df
+
+
+def density(x, y, x_range=None, y_range=None, weights=None, bins=DENSITY_BINS):
+    # 2D histogram: (x centers, y centers, counts, mean of weights per bin or None), arrays indexed [y, x]
+    x = np.asarray(x, dtype='float64')
+    y = np.asarray(y, dtype='float64')
+    x_range = x_range or (float(np.nanmin(x)), float(np.nanmax(x)))
+    y_range = y_range or (float(np.nanmin(y)), float(np.nanmax(y)))
+    counts, x_edges, y_edges = np.histogram2d(x, y, bins=bins, range=[x_range, y_range])
+    means = None
+    if weights is not None:
+        totals, _, _ = np.histogram2d(x, y, bins=[x_edges, y_edges], weights=np.asarray(weights, dtype='float64'))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            means = np.where(counts > 0, totals / counts, np.nan).T
+    counts = np.where(counts > 0, counts, np.nan).T
+    # float32 halves the serialized grid; plenty for colors and hover text
+    if means is not None:
+        means = means.astype('float32')
+    return (x_edges[:-1] + x_edges[1:]) / 2, (y_edges[:-1] + y_edges[1:]) / 2, counts.astype('float32'), means
+
+
+def relayout_ranges(relayout):
+    # (x range, y range) from a Graph's relayoutData; None for an axis left on autorange,
+    # "reset" when the user double-clicked back to the full view
+    if not relayout:
+        return None
+    if relayout.get("xaxis.autorange") or relayout.get("yaxis.autorange"):
+        return "reset"
+    ranges = []
+    for axis in ("xaxis", "yaxis"):
+        if f"{axis}.range[0]" in relayout:
+            ranges.append((relayout[f"{axis}.range[0]"], relayout[f"{axis}.range[1]"]))
+        elif f"{axis}.range" in relayout:
+            ranges.append(tuple(relayout[f"{axis}.range"]))
+        else:
+            ranges.append(None)
+    return None if ranges == [None, None] else tuple(ranges)
@@ -0,0 +1,99 @@
+# Streaming export of the filtered rows ("Download Filtered Data" in tab 1)
+#
+# The rows are encoded EXPORT_CHUNK_ROWS at a time as CSV, gzip-compressed CSV,
+# Parquet (one row group per chunk) or Arrow IPC, and every chunk is yielded to
+# the HTTP response as soon as it is encoded. A download never holds more than
+# one chunk of output in memory, whatever the size of the selection.
+# Parquet and Arrow need pyarrow; without it only the CSV formats are offered.
+
+import importlib.util
+import io
+import zlib
+
+from startup import load
+
+EXPORT_CHUNK_ROWS = 50000
+
+# format -> (label, file extension, MIME type)
+FORMATS = {
+    "csv": ("CSV", ".csv", "text/csv"),
+    "csv.gz": ("CSV (gzip)", ".csv.gz", "application/gzip"),
+    "parquet": ("Parquet", ".parquet", "application/vnd.apache.parquet"),
+    "arrow": ("Arrow", ".arrow", "application/vnd.apache.arrow.file"),
+}
+ARROW_FORMATS = ("parquet", "arrow")
+
+
+def available_formats():
+    if importlib.util.find_spec("pyarrow") is not None:
+        return list(FORMATS)
+    return [f for f in FORMATS if f not in ARROW_FORMATS]
+
+
+class _Sink(io.RawIOBase):
+    # Write-only file that hands out what was written since the last drain()
+
+    def __init__(self):
+        self._parts = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b"".join(self._parts)
+        self._parts.clear()
+        return data
+
+
+def _chunks(dff, chunk_rows):
+    # At least one (possibly empty) chunk, so every format writes its header
+    for start in range(0, max(len(dff), 1), chunk_rows):
+        yield dff.iloc[start:start + chunk_rows]
+
+
+def _csv(dff, chunk_rows):
+    for i, chunk in enumerate(_chunks(dff, chunk_rows)):
+        yield chunk.to_csv(header=i == 0).encode("utf-8")
+
+
+def _gzip(dff, chunk_rows):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)     # wbits 31: gzip container
+    for data in _csv(dff, chunk_rows):
+        yield compressor.compress(data)
+    yield compressor.flush()
+
+
+def _arrow(dff, chunk_rows, fmt):
+    pa = load("pyarrow")
+    sink = _Sink()
+    # One schema for every chunk (categorical columns keep their full dictionary)
+    schema = pa.Schema.from_pandas(dff.iloc[:0], preserve_index=True)
+    if fmt == "parquet":
+        writer = load("pyarrow.parquet").ParquetWriter(sink, schema)
+    else:
+        writer = pa.ipc.new_file(sink, schema)
+    with writer:
+        for chunk in _chunks(dff, chunk_rows):
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=True))
+            yield sink.drain()
+    yield sink.drain()
+
+
+def stream(dff, fmt, chunk_rows=EXPORT_CHUNK_ROWS):
+    # Generator of the encoded file, chunk by chunk
+    if fmt == "csv":
+        chunks = _csv(dff, chunk_rows)
+    elif fmt == "csv.gz":
+        chunks = _gzip(dff, chunk_rows)
+    else:
+        chunks = _arrow(dff, chunk_rows, fmt)
+    return (data for data in chunks if data)
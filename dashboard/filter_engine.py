@@ -0,0 +1,129 @@
+# Indexed filter engine shared by the dashboard callbacks
+#
+# The engine is built once at startup. Region and crop are stored as integer
+# codes and the rows are sorted by (crop, region, year), so every
+# (crop, region) pair owns one contiguous block of rows with sorted years.
+# A filter selection is resolved to row positions with binary searches on a
+# composite key instead of copying and masking the full table.
+
+import numpy as np
+import pandas as pd
+
+from rollup import cells_from_frame
+
+
+class FilterEngine:
+
+    def __init__(self, df):
+        # Integer codes for region and crop
+        region_codes, regions = pd.factorize(df['region'], sort=True)
+        crop_codes, crops = pd.factorize(df['crop'], sort=True)
+        years = df['year'].to_numpy()
+
+        # Sort rows by (crop, region, year); the original index labels are kept
+        order = np.lexsort((years, region_codes, crop_codes))
+        self.df = df.take(order)
+        self.regions = list(regions)
+        self.crops = list(crops)
+        self._region_lookup = {r: i for i, r in enumerate(self.regions)}
+        self._crop_lookup = {c: i for i, c in enumerate(self.crops)}
+
+        self.region_codes = region_codes[order]
+        self.crop_codes = crop_codes[order]
+        self.years = years[order]
+        self.min_year = int(self.years.min()) if len(self.years) else 0
+        self.max_year = int(self.years.max()) if len(self.years) else 0
+
+        # Composite key (block, year offset) is monotonic over the sorted rows
+        self._year_span = self.max_year - self.min_year + 1
+        block_keys = self.crop_codes.astype(np.int64) * len(self.regions) + self.region_codes
+        self._keys = block_keys * self._year_span + (self.years - self.min_year)
+
+        # Every (crop, region) block present in the data
+        self._block_keys = np.unique(block_keys)
+
+    @classmethod
+    def from_arrays(cls, df, regions, crops, arrays):
+        # Engine over rows already sorted by (crop, region, year), with the key
+        # arrays of arrays() (mapped read-only from the shared store, see shared_store.py)
+        engine = cls.__new__(cls)
+        engine.df = df
+        engine.regions = list(regions)
+        engine.crops = list(crops)
+        engine._region_lookup = {r: i for i, r in enumerate(engine.regions)}
+        engine._crop_lookup = {c: i for i, c in enumerate(engine.crops)}
+
+        engine.region_codes = arrays['region_codes']
+        engine.crop_codes = arrays['crop_codes']
+        engine.years = df['year'].to_numpy()
+        engine.min_year = int(engine.years.min()) if len(engine.years) else 0
+        engine.max_year = int(engine.years.max()) if len(engine.years) else 0
+        engine._year_span = engine.max_year - engine.min_year + 1
+        engine._keys = arrays['keys']
+        engine._block_keys = arrays['block_keys']
+        return engine
+
+    def arrays(self):
+        # Sorted code and key arrays; with df, regions and crops they rebuild the engine
+        return {'region_codes': self.region_codes, 'crop_codes': self.crop_codes,
+                'keys': self._keys, 'block_keys': self._block_keys}
+
+    def __len__(self):
+        return len(self.df)
+
+    def _codes(self, values, lookup):
+        codes = [lookup[v] for v in values if v in lookup]
+        return np.array(sorted(set(codes)), dtype=np.int64)
+
+    def _blocks(self, regions, crops):
+        # Block keys of the selected (crop, region) pairs that exist in the data
+        crop_codes = self._codes(crops, self._crop_lookup) if crops else np.arange(len(self.crops))
+        region_codes = self._codes(regions, self._region_lookup) if regions else np.arange(len(self.regions))
+        wanted = (crop_codes[:, None] * len(self.regions) + region_codes[None, :]).ravel()
+        return self._block_keys[np.isin(self._block_keys, wanted, assume_unique=True)]
+
+    def ranges(self, regions=None, crops=None, years=None):
+        # Resolve a selection to half-open [start, end) row ranges
+        y0, y1 = (self.min_year, self.max_year) if years is None else (int(years[0]), int(years[1]))
+        y0, y1 = max(y0, self.min_year), min(y1, self.max_year)
+        if y0 > y1:
+            return np.array([], dtype=np.int64), np.array([], dtype=np.int64)
+
+        if not regions and not crops and y0 == self.min_year and y1 == self.max_year:
+            return np.array([0]), np.array([len(self.df)])
+
+        blocks = self._blocks(regions, crops)
+        lo = np.searchsorted(self._keys, blocks * self._year_span + (y0 - self.min_year), side='left')
+        hi = np.searchsorted(self._keys, blocks * self._year_span + (y1 - self.min_year), side='right')
+        keep = hi > lo
+        return lo[keep], hi[keep]
+
+    def positions(self, regions=None, crops=None, years=None):
+        # Row positions (into self.df) matching the selection
+        return _expand(*self.ranges(regions, crops, years))
+
+    def filter(self, regions=None, crops=None, years=None):
+        # DataFrame of the matching rows; the full table is returned uncopied
+        starts, ends = self.ranges(regions, crops, years)
+        if len(starts) == 1 and starts[0] == 0 and ends[0] == len(self.df):
+            return self.df
+        if len(starts) == 1:
+            return self.df.iloc[starts[0]:ends[0]]
+        return self.df.take(_expand(starts, ends))
+
+    def columns(self, names):
+        # Only the given columns of every row (not copied)
+        return self.df[names]
+
+    def rollup_cells(self):
+        # Per (crop, region, year) aggregates for the rollup cube
+        return cells_from_frame(self.df)
+
+
+def _expand(starts, ends):
+    # Concatenate the [start, end) ranges into one array of row positions
+    lengths = ends - starts
+    if lengths.sum() == 0:
+        return np.array([], dtype=np.int64)
+    offsets = np.repeat(starts - np.r_[0, np.cumsum(lengths)[:-1]], lengths)
+    return np.arange(lengths.sum()) + offsets
@@ -0,0 +1,96 @@
+# Region geometry index for the map callbacks
+#
+# Built once when the GeoJSON is loaded: a name -> feature map plus the
+# centroid, representative point and bounding box of every region, so the
+# map callbacks never scan the feature list or run Shapely per request.
+#
+# The base features are read-only (tuple coordinates, mapping-proxy
+# properties) and shared by all requests. Callbacks never write into them;
+# they pass their own region -> value overlay to overlay(), which returns a
+# fresh FeatureCollection that reuses the shared geometry objects.
+#
+# The points and bounds can be passed in precomputed (see shared_store.py);
+# Shapely is only imported when they have to be computed.
+
+import json
+from types import MappingProxyType
+
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+class GeoIndex:
+
+    def __init__(self, geojson, shapes=None):
+        # shapes: region name -> (centroid, representative point, bounds) as returned by shapes()
+        self._base = tuple(
+            MappingProxyType({
+                "type": "Feature",
+                "id": feature.get("id"),
+                "properties": _freeze(feature.get("properties") or {}),
+                "geometry": {"type": feature["geometry"]["type"],
+                             "coordinates": _freeze(feature["geometry"]["coordinates"])},
+            })
+            for feature in geojson['features']
+        )
+        self.features = {}
+        self.centroids = {}
+        self.representative_points = {}
+        self.bounds = {}
+
+        for feature in self._base:
+            name = feature['properties'].get('name')
+            if name is None or name in self.features:
+                continue
+            self.features[name] = feature
+            if shapes is not None and name in shapes:
+                centroid, point, bounds = shapes[name]
+                self.centroids[name] = list(centroid)
+                self.representative_points[name] = list(point)
+                self.bounds[name] = tuple(bounds)
+                continue
+            from shapely.geometry import shape
+            geom = shape(feature['geometry'])
+            centroid = geom.centroid
+            point = geom.representative_point()
+            # Stored as [lat, lon] ready for map markers
+            self.centroids[name] = [centroid.y, centroid.x]
+            self.representative_points[name] = [point.y, point.x]
+            # (min_lon, min_lat, max_lon, max_lat)
+            self.bounds[name] = geom.bounds
+
+    @classmethod
+    def from_file(cls, path, shapes=None):
+        with open(path, "r") as f:
+            return cls(json.load(f), shapes)
+
+    def shapes(self):
+        # The precomputed points and bounds, JSON-serializable
+        return {name: (self.centroids[name], self.representative_points[name], list(self.bounds[name]))
+                for name in self.features}
+
+    def __contains__(self, name):
+        return name in self.features
+
+    def feature(self, name):
+        return self.features.get(name)
+
+    def centroid(self, name):
+        return self.centroids.get(name)
+
+    def overlay(self, properties, default=None):
+        # Per-request FeatureCollection; properties maps property -> {region: value}
+        features = []
+        for base in self._base:
+            props = dict(base['properties'])
+            name = props.get('name')
+            for prop, values in properties.items():
+                props[prop] = values.get(name, default)
+            features.append({"type": "Feature", "id": base["id"],
+                             "properties": props, "geometry": base["geometry"]})
+        return {"type": "FeatureCollection", "features": features}
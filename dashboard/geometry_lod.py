@@ -0,0 +1,223 @@
+# Multi-resolution world geometry for the map payloads
+#
+# Offline step that turns assets/world_countries.geojson into a few levels of
+# detail. Each level is simplified with shared borders kept consistent between
+# neighbouring countries (coverage simplification) and its coordinates are
+# snapped to a fixed grid, so they serialize with only a few decimals. Every
+# level is checked against the full-precision source for shape (Hausdorff
+# distance) and area error before it is written.
+#
+# The levels are cached in assets/geometry/ together with a manifest holding
+# the source fingerprint; re-running skips the work when nothing changed.
+# Shapely is only imported by the build, so the dashboard can look up the
+# level of a zoom and its fingerprint cheaply at startup.
+#
+#   python geometry_lod.py           # build missing or stale levels
+#   python geometry_lod.py --force   # rebuild every level
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import sys
+
+SOURCE_PATH = "assets/world_countries.geojson"
+OUTPUT_DIR = "assets/geometry"
+MANIFEST_NAME = "manifest.json"
+
+# One level per zoom band. tolerance is the simplification strength, grid the
+# coordinate quantization step (degrees); max_distance (degrees) and
+# max_area_error (relative, countries of at least 1 square degree) are the
+# error budgets checked before a level is accepted. With fine_tolerance, the
+# countries the coarse tolerance would push over a budget (mostly small ones)
+# keep the fine_tolerance shape instead. At zoom 2 a pixel spans about 0.35
+# degrees, so "low" may move a border by about three pixels but keeps every
+# country's area within 8%.
+LEVELS = [
+    {"name": "low", "max_zoom": 2, "tolerance": 0.6, "fine_tolerance": 0.2, "grid": 0.01,
+     "max_distance": 1.0, "max_area_error": 0.08},
+    {"name": "medium", "max_zoom": 4, "tolerance": 0.1, "grid": 0.01,
+     "max_distance": 0.15, "max_area_error": 0.05},
+    {"name": "high", "max_zoom": None, "tolerance": 0.02, "grid": 0.001,
+     "max_distance": 0.1, "max_area_error": 0.01},
+]
+
+
+def level_path(level, output_dir=OUTPUT_DIR):
+    return os.path.join(output_dir, f"world_countries.{level['name']}.geojson")
+
+
+def level_for_zoom(zoom):
+    for level in LEVELS:
+        if level["max_zoom"] is None or zoom <= level["max_zoom"]:
+            return level
+    return LEVELS[-1]
+
+
+def path_for_zoom(zoom, source=SOURCE_PATH, output_dir=OUTPUT_DIR):
+    # Geometry file to use for a map opened at this zoom; the full-precision
+    # source is used until the levels have been built
+    path = level_path(level_for_zoom(zoom), output_dir)
+    return path if os.path.exists(path) else source
+
+
+def fingerprint(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def version_for_zoom(zoom):
+    # Content fingerprint of the geometry used at this zoom, part of the cached map keys
+    return fingerprint(path_for_zoom(zoom))[:12]
+
+
+def _quantize(geom, grid):
+    # Snap to the grid; fall back to point-wise rounding for invalid input
+    import shapely
+    try:
+        snapped = shapely.set_precision(geom, grid)
+    except shapely.errors.GEOSException:
+        snapped = shapely.set_precision(geom, grid, mode="pointwise")
+    # Keep tiny islands that would collapse to nothing on the grid
+    return geom if snapped.is_empty else snapped
+
+
+def _round_coordinates(coords, decimals):
+    if isinstance(coords[0], (int, float)):
+        return [round(coords[0], decimals), round(coords[1], decimals)]
+    return [_round_coordinates(c, decimals) for c in coords]
+
+
+def _simplify_protected(geoms, level):
+    # Two passes over the countries plus the ocean around them, so coastlines are
+    # shared edges too: all at fine_tolerance, then all but the protected
+    # countries again at tolerance. The protected countries' borders are the
+    # boundary of the second pass and are kept, so their neighbours still match
+    # them. Countries over a budget after the second pass join the protected
+    # ones and it is repeated.
+    import shapely
+    from shapely.geometry import box
+    ocean = box(-180, -90, 180, 90).difference(shapely.union_all(shapely.make_valid(geoms)))
+    fine = list(shapely.coverage_simplify(list(geoms) + [ocean], level["fine_tolerance"],
+                                          simplify_boundary=False))
+    protected = set()
+    while True:
+        keep = [i for i in range(len(geoms)) if i not in protected]
+        coarse = shapely.coverage_simplify([fine[i] for i in keep] + [fine[-1]], level["tolerance"],
+                                           simplify_boundary=False)
+        simplified = fine[:-1]
+        for i, geom in zip(keep, coarse):
+            simplified[i] = geom
+        distances, area_errors = _feature_errors(geoms, simplified)
+        over = {i for i in keep if distances[i] > level["max_distance"] or area_errors[i] > level["max_area_error"]}
+        if not over:
+            return simplified
+        protected |= over
+
+
+def simplify(geoms, level):
+    import shapely
+    if not hasattr(shapely, "coverage_simplify"):
+        # Older Shapely: per-feature, so shared borders may drift apart slightly
+        tolerance = level.get("fine_tolerance", level["tolerance"])
+        simplified = [g.simplify(tolerance, preserve_topology=True) for g in geoms]
+    elif "fine_tolerance" in level:
+        simplified = _simplify_protected(geoms, level)
+    else:
+        simplified = shapely.coverage_simplify(geoms, level["tolerance"])
+    return [_quantize(g, level["grid"]) for g in simplified]
+
+
+def _feature_errors(original, simplified):
+    # Per feature: Hausdorff distance and relative area error (0 under 1 square degree)
+    distances = [s.hausdorff_distance(o) for o, s in zip(original, simplified)]
+    area_errors = [abs(s.area - o.area) / o.area if o.area >= 1 else 0.0
+                   for o, s in zip(original, simplified)]
+    return distances, area_errors
+
+
+def measure_error(original, simplified):
+    import shapely
+    distances, area_errors = _feature_errors(original, simplified)
+    return {"max_distance": round(max(distances), 4),
+            "max_area_error": round(max(area_errors), 4) if area_errors else 0.0,
+            "vertices": int(sum(len(shapely.get_coordinates(g)) for g in simplified))}
+
+
+def build_level(source_geojson, original, level):
+    from shapely.geometry import mapping
+    simplified = simplify(original, level)
+    error = measure_error(original, simplified)
+    decimals = max(0, -int(round(math.log10(level["grid"]))))
+
+    features = []
+    for feature, geom in zip(source_geojson["features"], simplified):
+        geometry = mapping(geom)
+        features.append({
+            "type": "Feature",
+            "id": feature.get("id"),
+            "properties": feature.get("properties") or {},
+            "geometry": {"type": geometry["type"],
+                         "coordinates": _round_coordinates(geometry["coordinates"], decimals)},
+        })
+    return {"type": "FeatureCollection", "features": features}, error
+
+
+def build_levels(source=SOURCE_PATH, output_dir=OUTPUT_DIR, force=False, log=print):
+    from shapely.geometry import shape
+    source_hash = fingerprint(source)
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+
+    with open(source) as f:
+        source_geojson = json.load(f)
+    original = [shape(feature["geometry"]) for feature in source_geojson["features"]]
+    os.makedirs(output_dir, exist_ok=True)
+
+    failures = []
+    levels = {}
+    for level in LEVELS:
+        path = level_path(level, output_dir)
+        previous = manifest.get("levels", {}).get(level["name"])
+        if (not force and previous and os.path.exists(path)
+                and manifest.get("source_sha256") == source_hash and previous["params"] == level):
+            log(f"{level['name']}: up to date")
+            levels[level["name"]] = previous
+            continue
+
+        collection, error = build_level(source_geojson, original, level)
+        if error["max_distance"] > level["max_distance"] or error["max_area_error"] > level["max_area_error"]:
+            failures.append(level["name"])
+            log(f"{level['name']}: error over budget {error}")
+            # Drop a stale file so the maps fall back to the source geometry
+            if os.path.exists(path):
+                os.remove(path)
+            continue
+
+        with open(path, "w") as f:
+            json.dump(collection, f, separators=(",", ":"))
+        error["bytes"] = os.path.getsize(path)
+        levels[level["name"]] = {"params": level, "error": error}
+        log(f"{level['name']}: {error['vertices']} vertices, {error['bytes']} bytes, "
+            f"max distance {error['max_distance']}, max area error {error['max_area_error']}")
+
+    with open(manifest_path, "w") as f:
+        json.dump({"source": source, "source_sha256": source_hash,
+                   "source_bytes": os.path.getsize(source), "levels": levels}, f, indent=2)
+    return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build simplified, quantized levels of detail of the world geometry.")
+    parser.add_argument("--source", default=SOURCE_PATH)
+    parser.add_argument("--output-dir", default=OUTPUT_DIR)
+    parser.add_argument("--force", action="store_true", help="rebuild every level even if it is up to date")
+    args = parser.parse_args()
+    sys.exit(1 if build_levels(args.source, args.output_dir, args.force) else 0)
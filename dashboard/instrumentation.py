@@ -0,0 +1,274 @@
+# Per-callback metrics for the dashboard
+#
+# Every @app.callback function is wrapped (instrument_callbacks) to record its
+# wall time, the time spent in named phases ("filter", "figure", ...), the
+# exceptions it raised (not PreventUpdate or HTTP error responses such as
+# abort(400) for a bad request) and, for requests served by Flask, the size
+# of the response and the time Dash spent around the callback decoding the
+# request and serializing the response ("serialize"). Cache counters are read
+# from registered caches when scraped. Everything is exposed in the
+# Prometheus text format on /metrics.
+#
+# Opt-in profiling: with CROP_PROFILE_SLOWEST=N every callback call runs
+# under cProfile and the N slowest calls are kept as .prof files in
+# CROP_PROFILE_DIR (view with `python -m pstats` or snakeviz).
+
+import cProfile
+import functools
+import heapq
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+import flask
+from dash.exceptions import PreventUpdate
+from werkzeug.exceptions import HTTPException
+
+log = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BYTES_BUCKETS = (1024, 10 * 1024, 100 * 1024, 1024 ** 2, 10 * 1024 ** 2)
+
+_local = threading.local()
+
+
+class Histogram:
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+
+class Metrics:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = defaultdict(int)
+        self.exceptions = defaultdict(int)           # (callback, exception type)
+        self.durations = defaultdict(lambda: Histogram(DURATION_BUCKETS))
+        self.response_bytes = defaultdict(lambda: Histogram(BYTES_BUCKETS))
+        self.phase_seconds = defaultdict(float)      # (callback, phase)
+        self.phase_counts = defaultdict(int)
+        self.caches = {}
+
+    def register_cache(self, name, cache):
+        # Any object with stats() -> {"hits", "misses", "entries", "bytes"}
+        self.caches[name] = cache
+
+    def record_call(self, callback, seconds, phases):
+        with self._lock:
+            self.calls[callback] += 1
+            self.durations[callback].observe(seconds)
+            for phase, spent in phases.items():
+                self.phase_seconds[callback, phase] += spent
+                self.phase_counts[callback, phase] += 1
+
+    def record_exception(self, callback, exc):
+        with self._lock:
+            self.exceptions[callback, type(exc).__name__] += 1
+
+    def record_response(self, callback, size, serialize_seconds):
+        with self._lock:
+            self.response_bytes[callback].observe(size)
+            self.phase_seconds[callback, "serialize"] += serialize_seconds
+            self.phase_counts[callback, "serialize"] += 1
+
+    def render(self):
+        # Prometheus text exposition format (version 0.0.4)
+        lines = []
+        with self._lock:
+            lines += _header("crop_callback_calls_total", "counter", "Callback invocations")
+            lines += [f'crop_callback_calls_total{{callback="{c}"}} {n}' for c, n in sorted(self.calls.items())]
+
+            lines += _header("crop_callback_exceptions_total", "counter", "Exceptions raised or caught in callbacks")
+            lines += [f'crop_callback_exceptions_total{{callback="{c}",exception="{e}"}} {n}'
+                      for (c, e), n in sorted(self.exceptions.items())]
+
+            lines += _header("crop_callback_duration_seconds", "histogram", "Callback wall time")
+            for c, h in sorted(self.durations.items()):
+                lines += _histogram("crop_callback_duration_seconds", f'callback="{c}"', h)
+
+            lines += _header("crop_callback_phase_seconds", "summary",
+                             "Time per callback phase (filter, figure, serialize, other)")
+            for (c, p), spent in sorted(self.phase_seconds.items()):
+                labels = f'callback="{c}",phase="{p}"'
+                lines.append(f"crop_callback_phase_seconds_sum{{{labels}}} {spent:.6f}")
+                lines.append(f"crop_callback_phase_seconds_count{{{labels}}} {self.phase_counts[c, p]}")
+
+            lines += _header("crop_callback_response_bytes", "histogram", "Serialized callback response size")
+            for c, h in sorted(self.response_bytes.items()):
+                lines += _histogram("crop_callback_response_bytes", f'callback="{c}"', h)
+
+        caches = {name: cache.stats() for name, cache in sorted(self.caches.items())}
+        for key, kind, help_text in (("hits", "counter", "Cache hits"), ("misses", "counter", "Cache misses"),
+                                     ("entries", "gauge", "Cached entries"), ("bytes", "gauge", "Cached bytes")):
+            name = f"crop_cache_{key}" + ("_total" if kind == "counter" else "")
+            lines += _header(name, kind, help_text)
+            lines += [f'{name}{{cache="{c}"}} {stats[key]}' for c, stats in caches.items()]
+        return "\n".join(lines) + "\n"
+
+
+def _header(name, kind, help_text):
+    return [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+
+
+def _histogram(name, labels, h):
+    lines = [f'{name}_bucket{{{labels},le="{bound}"}} {n}' for bound, n in zip(h.buckets, h.counts)]
+    lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {h.count}')
+    lines.append(f"{name}_sum{{{labels}}} {h.sum:.6f}")
+    lines.append(f"{name}_count{{{labels}}} {h.count}")
+    return lines
+
+
+metrics = Metrics()
+
+
+# Phases and exceptions inside a callback
+
+@contextmanager
+def phase(name):
+    # Time a block of the running callback; a no-op outside instrumented callbacks
+    phases = getattr(_local, "phases", None)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if phases is not None:
+            phases[name] = phases.get(name, 0.0) + time.perf_counter() - start
+
+
+def record_exception(exc):
+    # For exceptions a callback handles itself (e.g. rendered as an error message)
+    callback = getattr(_local, "callback", None)
+    if callback is not None:
+        metrics.record_exception(callback, exc)
+    log.exception("Error in callback %s", callback or "?", exc_info=exc)
+
+
+# Opt-in cProfile capture of the slowest calls
+
+class SlowestProfiles:
+
+    def __init__(self, keep, directory):
+        self.keep = keep
+        self.directory = directory
+        self._slowest = []                          # min-heap of (seconds, path)
+        self._lock = threading.Lock()
+        # cProfile cannot profile two threads at once; concurrent calls run unprofiled
+        self._active = threading.Lock()
+
+    def run(self, callback, func, args, kwargs):
+        if not self._active.acquire(blocking=False):
+            return func(*args, **kwargs)
+        profile = cProfile.Profile()
+        start = time.perf_counter()
+        try:
+            return profile.runcall(func, *args, **kwargs)
+        finally:
+            self._active.release()
+            self._keep(callback, profile, time.perf_counter() - start)
+
+    def _keep(self, callback, profile, seconds):
+        with self._lock:
+            if len(self._slowest) >= self.keep and seconds <= self._slowest[0][0]:
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, f"{callback}-{int(seconds * 1000)}ms-{time.time_ns()}.prof")
+            profile.dump_stats(path)
+            heapq.heappush(self._slowest, (seconds, path))
+            if len(self._slowest) > self.keep:
+                _, dropped = heapq.heappop(self._slowest)
+                if os.path.exists(dropped):
+                    os.remove(dropped)
+
+
+profiler = None
+if int(os.environ.get("CROP_PROFILE_SLOWEST", 0)) > 0:
+    profiler = SlowestProfiles(int(os.environ["CROP_PROFILE_SLOWEST"]), os.environ.get("CROP_PROFILE_DIR", ".profiles"))
+
+
+# Wiring into Dash / Flask
+
+def instrument(func, name=None):
+    callback = name or func.__name__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        outer = (getattr(_local, "callback", None), getattr(_local, "phases", None))
+        _local.callback, _local.phases = callback, {}
+        start = time.perf_counter()
+        try:
+            if profiler is not None:
+                return profiler.run(callback, func, args, kwargs)
+            return func(*args, **kwargs)
+        except (PreventUpdate, HTTPException):
+            raise                                   # no update / a client error response (abort(400)), not faults
+        except Exception as exc:
+            metrics.record_exception(callback, exc)
+            raise
+        finally:
+            seconds = time.perf_counter() - start
+            phases = _local.phases
+            phases["other"] = max(0.0, seconds - sum(phases.values()))
+            metrics.record_call(callback, seconds, phases)
+            _local.callback, _local.phases = outer
+            if flask.has_request_context():
+                flask.g.crop_callback = callback
+                flask.g.crop_callback_seconds = seconds
+
+    return wrapper
+
+
+def instrument_callbacks(app):
+    # Make app.callback wrap every callback registered from now on
+    register = app.callback
+
+    def callback(*args, **kwargs):
+        decorator = register(*args, **kwargs)
+        return lambda func: decorator(instrument(func))
+
+    app.callback = callback
+
+
+def _is_local(address):
+    return address in ("127.0.0.1", "::1", "localhost") or (address or "").startswith("127.")
+
+
+def register_endpoint(server, mode=None):
+    # /metrics for Prometheus. CROP_METRICS: "local" (default, loopback clients only), "on" or "off"
+    mode = mode or os.environ.get("CROP_METRICS", "local")
+    if mode == "off":
+        return
+
+    @server.before_request
+    def start_timer():
+        flask.g.crop_request_start = time.perf_counter()
+
+    @server.after_request
+    def record_response(response):
+        # Response size and the serialization time around the callback (or instrumented route) itself
+        callback = flask.g.get("crop_callback")
+        # Streamed bodies (downloads) are not buffered just to be measured
+        if callback and not response.direct_passthrough and not response.is_streamed:
+            total = time.perf_counter() - flask.g.crop_request_start
+            metrics.record_response(callback, len(response.get_data()),
+                                    max(0.0, total - flask.g.get("crop_callback_seconds", 0.0)))
+        return response
+
+    @server.route("/metrics")
+    def metrics_endpoint():
+        if mode != "on" and not _is_local(flask.request.remote_addr):
+            flask.abort(404)
+        return flask.Response(metrics.render(), mimetype="text/plain; version=0.0.4")
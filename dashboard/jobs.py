@@ -0,0 +1,128 @@
+# Background execution for the heavy callbacks (tab 5 map renders)
+#
+# A callback submits its work to the JobQueue under a slot, e.g. (client id,
+# "tab5"), and returns right away; a dcc.Interval polls the same callback until
+# the job is done. The queue runs at most `max_workers` jobs at a time so the
+# server threads stay free for the cheap callbacks. Submitting a different
+# key to a slot supersedes its previous job: a queued job is dropped, a running
+# one stops at its next progress() call. Identical keys submitted from several
+# slots share one job. The rendered maps live on disk in the map store, so a
+# finished job only keeps its small result.
+#
+# A slot lets go of its finished job once submit() has handed it back, so a
+# failed key runs again on the next submit. Finished jobs nobody collects (the
+# client went away) are kept for the last `max_finished` slots only.
+
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+
+
+class Cancelled(Exception):
+    pass
+
+
+def no_progress(fraction, message=None):
+    pass
+
+
+class Job:
+
+    def __init__(self, key):
+        self.key = key
+        self.state = QUEUED
+        self.fraction = 0.0
+        self.message = "Waiting for a free worker"
+        self.result = None
+        self.error = None
+        self.slots = set()
+        self.future = None
+        self._cancel = threading.Event()
+
+    @property
+    def finished(self):
+        return self.state in (DONE, FAILED, CANCELLED)
+
+    def progress(self, fraction, message=None):
+        # Called by the job function; doubles as its cancellation point
+        if self._cancel.is_set():
+            raise Cancelled()
+        self.fraction = min(1.0, max(0.0, fraction))
+        if message is not None:
+            self.message = message
+
+
+class JobQueue:
+
+    def __init__(self, max_workers, max_finished=1024):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="crop-job")
+        self.max_finished = max_finished
+        self._jobs = {}                             # key -> queued or running job
+        self._slots = {}                            # slot -> latest job submitted there
+        self._finished = OrderedDict()              # slots whose job finished, oldest first
+        self._lock = threading.Lock()
+
+    def submit(self, slot, key, func):
+        # Job for `key` in `slot`, starting func(progress) unless it is already queued, running or finished there
+        with self._lock:
+            current = self._slots.get(slot)
+            if current is not None and current.key == key and current.state != CANCELLED:
+                if current.finished:
+                    self._drop(slot)                # handed back now; the next submit starts afresh
+                return current
+            if current is not None:
+                self._release(current, slot)
+                self._finished.pop(slot, None)
+            job = self._jobs.get(key)
+            if job is None:
+                job = Job(key)
+                self._jobs[key] = job
+                job.future = self._executor.submit(self._run, job, func)
+            job.slots.add(slot)
+            self._slots[slot] = job
+            return job
+
+    def current(self, slot):
+        with self._lock:
+            return self._slots.get(slot)
+
+    def _drop(self, slot):
+        job = self._slots.pop(slot)
+        job.slots.discard(slot)
+        self._finished.pop(slot, None)
+
+    def _release(self, job, slot):
+        job.slots.discard(slot)
+        if job.slots or job.finished:
+            return
+        job._cancel.set()
+        if job.future.cancel():
+            job.state = CANCELLED
+        if self._jobs.get(job.key) is job:
+            del self._jobs[job.key]
+
+    def _run(self, job, func):
+        if job._cancel.is_set():
+            job.state = CANCELLED
+            return
+        job.state = RUNNING
+        job.message = "Starting"
+        try:
+            job.result = func(job.progress)
+            job.fraction, job.state = 1.0, DONE
+        except Cancelled:
+            job.state = CANCELLED
+        except Exception as e:
+            # Already logged and counted by the instrumented job function
+            job.error, job.state = str(e), FAILED
+        finally:
+            with self._lock:
+                if self._jobs.get(job.key) is job:
+                    del self._jobs[job.key]
+                for slot in job.slots:
+                    if self._slots.get(slot) is job:
+                        self._finished[slot] = job
+                while len(self._finished) > self.max_finished:
+                    self._drop(next(iter(self._finished)))
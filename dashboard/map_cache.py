@@ -0,0 +1,115 @@
+# Bounded LRU cache for rendered map HTML
+#
+# Entries are evicted least-recently-used first whenever either the entry
+# count or the total size in bytes goes over its limit. Hit/miss counters are
+# kept, and the callers count() every view (served from here or not) so the
+# most requested keys can be pre-rendered on the next startup. Every worker
+# adds its own counts to the saved file on exit, under a file lock.
+
+import json
+import os
+import threading
+from collections import Counter, OrderedDict
+
+try:
+    import fcntl
+except ImportError:                             # Windows: single-process development server
+    fcntl = None
+
+
+def _read_requests(path):
+    try:
+        with open(path) as f:
+            return Counter({tuple(key): count for key, count in json.load(f)})
+    except (OSError, ValueError):
+        return Counter()
+
+
+class RenderCache:
+
+    def __init__(self, max_entries=128, max_bytes=64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.requests = Counter()
+        self._loaded = Counter()                # counts read from disk, not to be saved twice
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def size_bytes(self):
+        return self._bytes
+
+    def get(self, key):
+        with self._lock:
+            if key in self._entries:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return self._entries[key][0]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        size = len(value.encode('utf-8'))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+
+    def get_or_render(self, key, render):
+        value = self.get(key)
+        if value is None:
+            value = render()
+            self.put(key, value)
+        return value
+
+    def stats(self):
+        return {"entries": len(self._entries), "bytes": self._bytes,
+                "hits": self.hits, "misses": self.misses}
+
+    # Warm-up helpers
+
+    def count(self, key):
+        with self._lock:
+            self.requests[key] += 1
+
+    def most_requested(self, n):
+        return [key for key, _ in self.requests.most_common(n)]
+
+    def save_requests(self, path):
+        # Add the counts of this process to those on disk (other workers save theirs too)
+        with self._lock:
+            counts = self.requests - self._loaded
+        if not counts:
+            return
+        with open(path + ".lock", "a") as lock:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                counts.update(_read_requests(path))
+                tmp_path = f"{path}.{os.getpid()}.tmp"
+                with open(tmp_path, "w") as f:
+                    json.dump([[list(key), count] for key, count in counts.most_common()], f)
+                os.replace(tmp_path, path)
+            finally:
+                if fcntl:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+        with self._lock:
+            self._loaded = self.requests.copy()
+
+    def load_requests(self, path):
+        loaded = _read_requests(path)
+        with self._lock:
+            self.requests.update(loaded)
+            self._loaded.update(loaded)
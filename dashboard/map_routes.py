@@ -0,0 +1,161 @@
+# HTTP caching for the rendered map documents
+#
+# The Folium choropleth of tab 5 is served from a Flask route (/maps/...)
+# and the callback only points the iframe src at it. MapStore turns a
+# normalized map key and a render function into a cacheable response:
+#
+# - a weak ETag derived from the key and the map version (dataset, geometry
+#   and renderer), checked before any work so a revalidation costs a 304
+# - Last-Modified from the dataset and geometry files, Cache-Control for
+#   browsers/proxies
+# - gzip (and brotli when the module is installed) chosen from Accept-Encoding
+# - a size-bounded disk cache holding every encoding of each rendered map,
+#   shared by all worker processes; one subdirectory per map version, and the
+#   directories of other versions are removed when a store is opened
+
+import gzip
+import hashlib
+import html
+import os
+import shutil
+import threading
+
+import flask
+
+from instrumentation import record_exception
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Preferred first
+ENCODINGS = (["br"] if brotli is not None else []) + ["gzip"]
+SUFFIXES = {"identity": ".html", "gzip": ".html.gz", "br": ".html.br"}
+
+
+def compress(data, encoding):
+    if encoding == "gzip":
+        return gzip.compress(data, compresslevel=6)
+    if encoding == "br":
+        return brotli.compress(data, quality=5)
+    return data
+
+
+class MapStore:
+
+    def __init__(self, directory, max_bytes, version, last_modified, max_age=3600):
+        self.directory = os.path.join(directory, hashlib.sha256(version.encode("utf-8")).hexdigest()[:16])
+        self.max_bytes = max_bytes
+        self.version = version
+        self.last_modified = last_modified
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+        self._remove_stale(directory)
+
+    def _remove_stale(self, directory):
+        # Maps of another dataset, geometry or renderer version are never served again
+        for entry in os.scandir(directory):
+            if entry.path == self.directory:
+                continue
+            if entry.is_dir():
+                shutil.rmtree(entry.path, ignore_errors=True)
+            else:
+                try:
+                    os.remove(entry.path)
+                except OSError:
+                    pass
+
+    def etag(self, key):
+        return hashlib.sha256(repr((key, self.version)).encode("utf-8")).hexdigest()[:32]
+
+    def _path(self, etag, encoding):
+        return os.path.join(self.directory, etag + SUFFIXES[encoding])
+
+    def _read(self, etag, encoding):
+        try:
+            with open(self._path(etag, encoding), "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _write(self, etag, document):
+        raw = document.encode("utf-8")
+        bodies = {"identity": raw}
+        bodies.update({encoding: compress(raw, encoding) for encoding in ENCODINGS})
+        for encoding, body in bodies.items():
+            # Temporary name + rename: other workers never read a partial file
+            path = self._path(etag, encoding)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(body)
+            os.replace(tmp_path, path)
+        self._prune()
+        return bodies
+
+    def has(self, key):
+        return os.path.exists(self._path(self.etag(key), "identity"))
+
+    def put(self, key, document):
+        # Store a map rendered elsewhere (a background job) for the route to serve
+        self._write(self.etag(key), document)
+
+    def _prune(self):
+        # Drop the least recently written files once the directory is over its budget
+        with self._lock:
+            entries = [e for e in os.scandir(self.directory) if e.is_file() and not e.name.endswith(".tmp")]
+            total = sum(e.stat().st_size for e in entries)
+            for entry in sorted(entries, key=lambda e: e.stat().st_mtime):
+                if total <= self.max_bytes:
+                    break
+                size = entry.stat().st_size
+                try:
+                    os.remove(entry.path)
+                    total -= size
+                except OSError:
+                    pass
+
+    def _not_modified(self, request, etag):
+        if request.if_none_match:
+            return request.if_none_match.contains_weak(etag)
+        since = request.if_modified_since
+        return since is not None and since.timestamp() >= int(self.last_modified)
+
+    def _headers(self, response, etag):
+        response.set_etag(etag, weak=True)
+        response.last_modified = self.last_modified
+        response.cache_control.public = True
+        response.cache_control.max_age = self.max_age
+        response.vary.add("Accept-Encoding")
+        return response
+
+    def response(self, key, render):
+        # Response for the map `key`, rendering it with render() -> HTML only when no cached copy exists
+        request = flask.request
+        etag = self.etag(key)
+        if self._not_modified(request, etag):
+            return self._headers(flask.Response(status=304), etag)
+
+        encoding = next((e for e in ENCODINGS if e in request.accept_encodings), "identity")
+        body = self._read(etag, encoding)
+        if body is None:
+            try:
+                body = self._write(etag, render())[encoding]
+            except Exception as e:
+                record_exception(e)
+                error = f'<p style="color:#dc3545;font-family:sans-serif">Error generating map: {html.escape(str(e))}</p>'
+                response = flask.Response(error, status=500, mimetype="text/html")
+                response.cache_control.no_store = True
+                return response
+        else:
+            # Refresh the file time so pruning keeps recently served maps
+            try:
+                os.utime(self._path(etag, encoding))
+            except OSError:
+                pass
+
+        response = flask.Response(body, mimetype="text/html")
+        if encoding != "identity":
+            response.headers["Content-Encoding"] = encoding
+        return self._headers(response, etag)
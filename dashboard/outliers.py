@@ -0,0 +1,196 @@
+# Grouped and rolling yield outlier detection
+#
+# Scores every row of the table against its own group (all rows, one crop, or
+# one crop in one region), optionally restricted to a centered window of
+# years. Scores are z-scores or robust MAD scores computed in one vectorized
+# pass (bincount segment sums, grouped medians, or for rolling medians the
+# sorted rows of each window, gathered from the rows sorted by group and year)
+# and cached per (method, grouping, window). The active region/crop/year
+# filters only select which of the cached flags are counted.
+
+import threading
+
+import numpy as np
+import pandas as pd
+
+METHODS = {'zscore': "Z-score", 'mad': "Robust (MAD)"}
+GROUPINGS = {'global': "All rows", 'crop': "Per crop", 'crop_region': "Per crop and region"}
+# Centered year windows; 0 scores against the whole group
+WINDOWS = [0, 3, 5, 9]
+
+# Groups (or windows) with fewer rows than this get no score
+MIN_ROWS = 3
+
+# Scales the MAD to the standard deviation of a normal distribution
+MAD_SCALE = 1.4826
+
+# Rolling variances below this fraction of the squared mean are rounding error
+VARIANCE_TOLERANCE = 1e-10
+
+
+class OutlierEngine:
+
+    # The columns the engine reads
+    COLUMNS = ['crop', 'region', 'year', 'yield_t_ha']
+
+    def __init__(self, df):
+        crop_codes, self.crops = pd.factorize(df['crop'], sort=True)
+        region_codes, self.regions = pd.factorize(df['region'], sort=True)
+        self._crop_lookup = {c: i for i, c in enumerate(self.crops)}
+        self._region_lookup = {r: i for i, r in enumerate(self.regions)}
+        self.crop_codes = crop_codes
+        self.region_codes = region_codes
+        self.years = df['year'].to_numpy(dtype=np.int64)
+        self.values = df['yield_t_ha'].to_numpy(dtype='float64')
+        self.min_year = int(self.years.min()) if len(self.years) else 0
+        self._year_span = int(self.years.max()) - self.min_year + 1 if len(self.years) else 1
+
+        self._scores = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.values)
+
+    def _groups(self, grouping):
+        # Dense group id per row and the number of groups
+        if grouping == 'global':
+            return np.zeros(len(self.values), dtype=np.int64), 1
+        if grouping == 'crop':
+            return self.crop_codes.astype(np.int64), len(self.crops)
+        if grouping == 'crop_region':
+            return self.crop_codes.astype(np.int64) * len(self.regions) + self.region_codes, \
+                len(self.crops) * len(self.regions)
+        raise ValueError(f"Unknown grouping: {grouping}")
+
+    def scores(self, method='zscore', grouping='global', window=0):
+        # Signed score per row (NaN where the group is too small or has no spread)
+        window = int(window) if window else 0
+        key = (method, grouping, window)
+        with self._lock:
+            if key in self._scores:
+                return self._scores[key]
+        if method not in METHODS:
+            raise ValueError(f"Unknown method: {method}")
+
+        groups, n_groups = self._groups(grouping)
+        if window:
+            # Cells are (group, year); each row is scored against the cells within window // 2 years
+            cells = groups * self._year_span + (self.years - self.min_year)
+            if method == 'zscore':
+                center, scale, count = _rolling_moments(cells, self.values, n_groups, self._year_span, window)
+            else:
+                center, scale, count = _rolling_mad(cells, self.values, n_groups, self._year_span, window)
+            center, scale, count = center[cells], scale[cells], count[cells]
+        elif method == 'zscore':
+            count = np.bincount(groups, minlength=n_groups)
+            mean = np.bincount(groups, self.values, minlength=n_groups) / np.maximum(count, 1)
+            squares = np.bincount(groups, (self.values - mean[groups]) ** 2, minlength=n_groups)
+            std = np.sqrt(squares / np.maximum(count - 1, 1))
+            center, scale, count = mean[groups], std[groups], count[groups]
+        else:
+            values = pd.Series(self.values)
+            by = values.groupby(groups, sort=False)
+            center = by.transform('median').to_numpy()
+            deviation = pd.Series(np.abs(self.values - center))
+            scale = MAD_SCALE * deviation.groupby(groups, sort=False).transform('median').to_numpy()
+            count = by.transform('size').to_numpy()
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            result = (self.values - center) / scale
+        result[(count < MIN_ROWS) | ~(scale > 0)] = np.nan
+
+        with self._lock:
+            self._scores[key] = result
+        return result
+
+    def mask(self, regions=None, crops=None, years=None):
+        # Boolean mask over the rows for a region/crop/year selection
+        mask = np.ones(len(self.values), dtype=bool)
+        if crops:
+            mask &= np.isin(self.crop_codes, [self._crop_lookup[c] for c in crops if c in self._crop_lookup])
+        if regions:
+            mask &= np.isin(self.region_codes, [self._region_lookup[r] for r in regions if r in self._region_lookup])
+        if years is not None:
+            mask &= (self.years >= years[0]) & (self.years <= years[1])
+        return mask
+
+    def flags(self, method='zscore', grouping='global', window=0, threshold=2.0):
+        # Rows whose absolute score exceeds the threshold
+        with np.errstate(invalid='ignore'):
+            return np.abs(self.scores(method, grouping, window)) > threshold
+
+    def summary(self, regions=None, crops=None, years=None, method='zscore', grouping='global',
+                window=0, threshold=2.0):
+        # (flagged rows, scored rows, flagged rows per crop) within the selection
+        selected = self.mask(regions, crops, years)
+        scores = self.scores(method, grouping, window)
+        flagged = self.flags(method, grouping, window, threshold) & selected
+        per_crop = np.bincount(self.crop_codes[flagged], minlength=len(self.crops))
+        by_crop = pd.Series(per_crop, index=self.crops, name='outliers')
+        return int(flagged.sum()), int((selected & ~np.isnan(scores)).sum()), by_crop[by_crop > 0]
+
+
+def _window_sum(dense, window):
+    # Sum over a centered window of years (axis 1) from cumulative sums
+    half = window // 2
+    span = dense.shape[1]
+    cumulative = np.concatenate([np.zeros((dense.shape[0], 1)), np.cumsum(dense, axis=1)], axis=1)
+    hi = np.minimum(np.arange(span) + half + 1, span)
+    lo = np.maximum(np.arange(span) - half, 0)
+    return cumulative[:, hi] - cumulative[:, lo]
+
+
+def _rolling_moments(cells, values, n_groups, span, window):
+    # Per-cell mean, standard deviation and count over the window
+    size = n_groups * span
+    count = np.bincount(cells, minlength=size).reshape(n_groups, span).astype('float64')
+    total = np.bincount(cells, values, minlength=size).reshape(n_groups, span)
+    squares = np.bincount(cells, values * values, minlength=size).reshape(n_groups, span)
+    count, total, squares = (_window_sum(a, window) for a in (count, total, squares))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = total / count
+        var = np.clip((squares - total * mean) / (count - 1), 0, None)
+    # The running sums leave rounding residue where a window has no spread; such
+    # windows get a zero scale (no score), not a tiny one
+    var[var <= VARIANCE_TOLERANCE * mean * mean] = 0.0
+    return mean.ravel(), np.sqrt(var).ravel(), count.ravel()
+
+
+def _rolling_mad(cells, values, n_groups, span, window):
+    # Per-cell median, scaled MAD and count over the window. Sorted by cell, the
+    # rows of one group within window // 2 years of a cell are one contiguous
+    # run, so every window is gathered as a segment of at most rows x window
+    # values in total, and its medians are read off the sorted segments
+    valid = ~np.isnan(values)
+    order = np.argsort(cells[valid], kind='stable')
+    sorted_cells = cells[valid][order]
+    sorted_values = values[valid][order]
+
+    occupied = np.unique(sorted_cells)
+    groups, offsets = np.divmod(occupied, span)
+    half = window // 2
+    lo = np.searchsorted(sorted_cells, groups * span + np.maximum(offsets - half, 0), side='left')
+    hi = np.searchsorted(sorted_cells, groups * span + np.minimum(offsets + half, span - 1), side='right')
+    count = hi - lo
+    starts = np.cumsum(count) - count
+    segments = np.repeat(np.arange(len(occupied)), count)
+    window_values = sorted_values[np.arange(count.sum()) + np.repeat(lo - starts, count)]
+
+    median = _segment_median(window_values, segments, starts, count)
+    mad = _segment_median(np.abs(window_values - median[segments]), segments, starts, count)
+
+    size = n_groups * span
+    cell_median, cell_mad, cell_count = np.full(size, np.nan), np.full(size, np.nan), np.zeros(size, dtype=np.int64)
+    cell_median[occupied], cell_mad[occupied], cell_count[occupied] = median, MAD_SCALE * mad, count
+    return cell_median, cell_mad, cell_count
+
+
+def _segment_median(values, segments, starts, count):
+    # Median of each segment (given by its start and row count in `values`). The
+    # values are sorted within their segments through one integer key (segment, rank)
+    n = len(values)
+    by_rank = np.argsort(values)
+    rank = np.empty(n, dtype=np.int64)
+    rank[by_rank] = np.arange(n)
+    ordered = values[by_rank[np.sort(segments * n + rank) % max(n, 1)]]
+    return (ordered[starts + (count - 1) // 2] + ordered[starts + count // 2]) / 2
@@ -0,0 +1,193 @@
+# Pre-aggregated rollup cube for summary cards and group-by charts
+#
+# One cell per (crop, region, year) holding the row count and the sum, min,
+# max and non-null count (<measure>_n) of every measure, plus the region /
+# crop / year marginals. Means divide by the non-null count, so missing
+# values are skipped as in pandas' mean(). Filtered
+# aggregates (averages, top crop, wettest year, per-region map statistics)
+# combine the selected cells, so their cost depends on the number of groups
+# rather than the number of rows.
+#
+# Each cell also carries the sufficient statistics of the complete rows
+# (count, sums and cross-products of the measures), so correlations and the
+# yield ~ rainfall + temperature + pesticide regression of any selection are
+# solved from a small summed matrix instead of refitting on raw rows.
+
+import numpy as np
+import pandas as pd
+
+KEYS = ['crop', 'region', 'year']
+MEASURES = ['yield_t_ha', 'rainfall_mm', 'avg_temp_c', 'pesticide_t']
+STATS = ['sum', 'min', 'max']
+
+# Regression target and regressors
+TARGET = 'yield_t_ha'
+REGRESSORS = ['rainfall_mm', 'avg_temp_c', 'pesticide_t']
+
+# Cross-product columns of the sufficient statistics: xp_<a>__<b> for a <= b
+CROSS_PRODUCTS = [(a, b) for i, a in enumerate(MEASURES) for b in MEASURES[i:]]
+
+
+def cross_product_column(a, b):
+    return f"xp_{a}__{b}"
+
+
+def cells_from_frame(df):
+    # Cells from an in-memory frame; sums are accumulated in float64
+    data = df[KEYS + MEASURES].astype({m: 'float64' for m in MEASURES})
+    grouped = data.groupby(KEYS, observed=True, sort=True)
+    cells = grouped[MEASURES].agg(STATS)
+    cells.columns = [f"{m}_{stat}" for m, stat in cells.columns]
+    cells = cells.join(grouped[MEASURES].count().add_suffix('_n'))
+    cells.insert(0, 'count', grouped.size())
+
+    # Sufficient statistics over rows where every measure is present
+    complete = data[MEASURES].notna().all(axis=1)
+    moments = pd.DataFrame({'n_complete': complete.astype('int64')}, index=data.index)
+    values = data[MEASURES].where(complete, 0.0)
+    for m in MEASURES:
+        moments[f"cs_{m}"] = values[m]
+    for a, b in CROSS_PRODUCTS:
+        moments[cross_product_column(a, b)] = values[a] * values[b]
+    moments = moments.groupby([data[k] for k in KEYS], observed=True, sort=True).sum()
+    return cells.join(moments).reset_index()
+
+
+class RollupCube:
+
+    def __init__(self, cells, presorted=False):
+        # presorted: cells already sorted with str labels, as in self.cells (see shared_store.py)
+        if not presorted:
+            cells = cells.sort_values(KEYS, kind='stable').reset_index(drop=True)
+            cells['crop'] = cells['crop'].astype(str)
+            cells['region'] = cells['region'].astype(str)
+        self.cells = cells
+
+        self._crop_codes, self.crops = pd.factorize(cells['crop'], sort=True)
+        self._region_codes, self.regions = pd.factorize(cells['region'], sort=True)
+        self._crop_lookup = {c: i for i, c in enumerate(self.crops)}
+        self._region_lookup = {r: i for i, r in enumerate(self.regions)}
+        self._years = cells['year'].to_numpy()
+        self._count = cells['count'].to_numpy()
+
+        # Marginals over every cell
+        self.by_crop = self._rollup(cells, 'crop')
+        self.by_region = self._rollup(cells, 'region')
+        self.by_year = self._rollup(cells, 'year')
+
+    def __len__(self):
+        return len(self.cells)
+
+    @staticmethod
+    def _rollup(cells, by):
+        aggs = {'count': 'sum'}
+        for m in MEASURES:
+            aggs.update({f"{m}_sum": 'sum', f"{m}_n": 'sum', f"{m}_min": 'min', f"{m}_max": 'max'})
+        return cells.groupby(by, sort=True).agg(aggs)
+
+    def mask(self, regions=None, crops=None, years=None):
+        # Boolean mask over the cells for a region/crop/year selection
+        mask = np.ones(len(self.cells), dtype=bool)
+        if crops:
+            mask &= np.isin(self._crop_codes, [self._crop_lookup[c] for c in crops if c in self._crop_lookup])
+        if regions:
+            mask &= np.isin(self._region_codes, [self._region_lookup[r] for r in regions if r in self._region_lookup])
+        if years is not None:
+            mask &= (self._years >= years[0]) & (self._years <= years[1])
+        return mask
+
+    def select(self, regions=None, crops=None, years=None):
+        return self.cells[self.mask(regions, crops, years)]
+
+    def mean(self, by, measure, regions=None, crops=None, years=None):
+        # Mean of a measure per group (by: column name or list of names)
+        cells = self.select(regions, crops, years)
+        grouped = cells.groupby(by, sort=True)[[f"{measure}_sum", f"{measure}_n"]].sum()
+        return (grouped[f"{measure}_sum"] / grouped[f"{measure}_n"]).rename(measure)
+
+    def summary(self, regions=None, crops=None, years=None):
+        # (average yield, top crop by mean yield, wettest year) of the selection
+        cells = self.select(regions, crops, years)
+        if cells.empty:
+            return 0, "N/A", "N/A"
+        avg_y = round(float(cells['yield_t_ha_sum'].sum() / cells['yield_t_ha_n'].sum()), 2)
+        by_crop = cells.groupby('crop', sort=True)[['yield_t_ha_sum', 'yield_t_ha_n']].sum()
+        top_crop = (by_crop['yield_t_ha_sum'] / by_crop['yield_t_ha_n']).idxmax()
+        wettest = cells['year'].iloc[int(np.argmax(cells['rainfall_mm_max'].to_numpy()))]
+        return avg_y, top_crop, wettest
+
+    def region_stats(self, regions=None, crops=None, years=None):
+        # Per region: mean and max yield and the number of crops grown
+        cells = self.select(regions, crops, years)
+        grouped = cells.groupby('region', sort=True)
+        stats = pd.DataFrame({
+            'mean_yield': grouped['yield_t_ha_sum'].sum() / grouped['yield_t_ha_n'].sum(),
+            'max_yield': grouped['yield_t_ha_max'].max(),
+            'crop_variety': grouped['crop'].nunique(),
+        })
+        return stats
+
+    def moments(self, regions=None, crops=None, years=None):
+        # Summed sufficient statistics of the selection over [year] + MEASURES:
+        # returns (variable names, n, vector of sums, matrix of cross-products)
+        cells = self.select(regions, crops, years)
+        names = ['year'] + MEASURES
+        n = float(cells['n_complete'].sum())
+        year = cells['year'].to_numpy(dtype='float64')
+        n_cell = cells['n_complete'].to_numpy(dtype='float64')
+
+        sums = np.array([(year * n_cell).sum()] + [cells[f"cs_{m}"].sum() for m in MEASURES])
+        cross = np.empty((len(names), len(names)))
+        # year is constant within a cell, so its cross-products come from the cell sums
+        cross[0, 0] = (year * year * n_cell).sum()
+        for i, m in enumerate(MEASURES, start=1):
+            cross[0, i] = cross[i, 0] = (year * cells[f"cs_{m}"].to_numpy()).sum()
+        for a, b in CROSS_PRODUCTS:
+            i, j = names.index(a), names.index(b)
+            cross[i, j] = cross[j, i] = cells[cross_product_column(a, b)].sum()
+        return names, n, sums, cross
+
+    def correlation(self, regions=None, crops=None, years=None):
+        # Pearson correlation matrix of the selection
+        names, n, sums, cross = self.moments(regions, crops, years)
+        if n < 2:
+            return pd.DataFrame(np.nan, index=names, columns=names)
+        cov = (cross - np.outer(sums, sums) / n) / (n - 1)
+        std = np.sqrt(np.clip(np.diag(cov), 0, None))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            corr = cov / np.outer(std, std)
+        return pd.DataFrame(np.clip(corr, -1, 1), index=names, columns=names)
+
+    def regression(self, regions=None, crops=None, years=None):
+        # Least squares fit of TARGET ~ REGRESSORS (with intercept) from the moments.
+        # Returns (r2, {regressor: coefficient}); (nan, {}) when there are too few rows
+        names, n, sums, cross = self.moments(regions, crops, years)
+        if n <= len(REGRESSORS):
+            return float('nan'), {}
+        x_idx = [names.index(r) for r in REGRESSORS]
+        y_idx = names.index(TARGET)
+
+        # Centered normal equations; the intercept follows from the means. Regressors that
+        # are constant in the selection (e.g. one region's rainfall) get no weight, as in lstsq
+        cov = cross - np.outer(sums, sums) / n
+        variance = np.diag(cov)[x_idx]
+        varying = variance > 1e-12 * np.diag(cross)[x_idx]
+        beta = np.zeros(len(x_idx))
+        if varying.any():
+            # Solve in standardized units so differently scaled regressors stay well conditioned
+            idx = np.array(x_idx)[varying]
+            scale = np.sqrt(variance[varying])
+            cxx = cov[np.ix_(idx, idx)] / np.outer(scale, scale)
+            cxy = cov[idx, y_idx] / scale
+            beta[varying] = np.linalg.lstsq(cxx, cxy, rcond=None)[0] / scale
+        cxy = cov[x_idx, y_idx]
+        sst = cov[y_idx, y_idx]
+        r2 = float(beta @ cxy / sst) if sst > 1e-12 * cross[y_idx, y_idx] else float('nan')
+        return r2, {r: round(float(b), 3) for r, b in zip(REGRESSORS, beta)}
+
+    def top_cells(self, by, measure, regions=None, crops=None, years=None):
+        # The cell holding the largest value of a measure within each group
+        cells = self.select(regions, crops, years)
+        if cells.empty:
+            return cells
+        return cells.loc[cells.groupby(by, sort=True)[f"{measure}_max"].idxmax()]
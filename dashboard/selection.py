@@ -0,0 +1,78 @@
+# Normalized filter selection and the memoized filter results
+#
+# A change of the region, crop or year filter is resolved once into a
+# normalized selection (sorted unique names, None for "all", the year range
+# clamped to the data) that is kept in the `shared-filters` store and read by
+# every callback depending on the filters. The matching rows are cached per
+# process under that selection, least-recently-used first out, so switching
+# tabs or re-rendering a chart does not filter the table again.
+#
+# Cached frames are shared between callbacks and must not be modified.
+
+import threading
+from collections import OrderedDict
+
+
+def normalize(regions, crops, years, min_year, max_year):
+    y0, y1 = (min_year, max_year) if not years else (int(years[0]), int(years[1]))
+    return {"regions": sorted(set(regions)) if regions else None,
+            "crops": sorted(set(crops)) if crops else None,
+            "years": [max(y0, min_year), min(y1, max_year)]}
+
+
+def unpack(selection):
+    # (regions, crops, years) of a normalized selection, as the engines and the cube take them
+    return selection["regions"], selection["crops"], selection["years"]
+
+
+def _key(selection):
+    regions, crops, years = unpack(selection)
+    return tuple(regions or ()), tuple(crops or ()), tuple(years)
+
+
+class FilterCache:
+
+    def __init__(self, engine, max_entries=32, max_bytes=64 * 1024 * 1024):
+        self.engine = engine
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def normalize(self, regions=None, crops=None, years=None):
+        return normalize(regions, crops, years, self.engine.min_year, self.engine.max_year)
+
+    def filter(self, regions=None, crops=None, years=None):
+        # engine.filter() of the selection, from the cache when it was filtered before
+        selection = self.normalize(regions, crops, years)
+        key = _key(selection)
+        with self._lock:
+            if key in self._entries:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return self._entries[key][0]
+            self.misses += 1
+
+        dff = self.engine.filter(*unpack(selection))
+        if dff is getattr(self.engine, "df", None):
+            return dff                              # the full table, not worth an entry
+        # Shallow size: the string columns count as their object pointers
+        size = int(dff.memory_usage(index=True).sum())
+        if size > self.max_bytes:
+            return dff
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (dff, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+        return dff
+
+    def stats(self):
+        return {"entries": len(self._entries), "bytes": self._bytes,
+                "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,186 @@
+# Read-only dataset shared by the worker processes
+#
+# With CROP_SHARED_STORE=<dir>, the cleaned table (every column and the index,
+# after the derived columns) and the filter engine's sorted code and key arrays
+# are written once to <dir> as .npy files, together with the rollup cube cells.
+# Every worker maps them read-only (np.load(mmap_mode='r')) and wraps them in
+# DataFrames without copying, so the pages are held once in the OS page cache
+# however many workers run, and a worker starts without reading, sorting or
+# aggregating the dataset.
+#
+# The first worker to find the store missing or holding another dataset
+# version builds it under a file lock into a temporary directory and swaps it
+# in; the others wait for the lock and map the result.
+#
+# Geometry objects cannot be shared between processes, but the Shapely-derived
+# centroids, representative points and bounds of the map regions are kept in
+# the store too, so workers load the region geometry without running Shapely.
+
+import json
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from filter_engine import FilterEngine
+from geo_index import GeoIndex
+from rollup import RollupCube
+
+try:
+    import fcntl
+except ImportError:                             # Windows: single-process development server
+    fcntl = None
+
+MANIFEST_NAME = "manifest.json"
+GEOMETRY_NAME = "geometry.json"
+
+# Bump when the stored layout changes (e.g. new rollup cell columns), so old stores are rebuilt
+STORE_FORMAT = 2
+
+
+@contextmanager
+def _locked(directory):
+    # Exclusive across processes while a store (or its geometry) is written
+    path = os.path.abspath(directory) + ".lock"
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "a") as f:
+        if fcntl:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _read_json(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def stored_version(directory):
+    manifest = _read_json(os.path.join(directory, MANIFEST_NAME))
+    return manifest and manifest.get("version")
+
+
+def _save_frame(directory, prefix, df):
+    # One .npy file per column; categorical and string columns as integer codes
+    # plus their categories. Returns the column specs for the manifest
+    columns = []
+    for i, name in enumerate(df.columns):
+        values = df[name]
+        path = os.path.join(directory, f"{prefix}.{i}.npy")
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            np.save(path, values.array.codes)
+            columns.append({"name": name, "categories": list(values.cat.categories),
+                            "ordered": bool(values.cat.ordered)})
+        elif pd.api.types.is_string_dtype(values.dtype):
+            codes, categories = pd.factorize(values, sort=True)
+            np.save(path, codes.astype(np.int32))
+            columns.append({"name": name, "categories": list(categories), "str": True})
+        else:
+            np.save(path, values.to_numpy())
+            columns.append({"name": name})
+    return columns
+
+
+def _map(path):
+    # Read-only view of the mapped file as a plain ndarray
+    return np.load(path, mmap_mode="r").view(np.ndarray)
+
+
+def _map_frame(directory, prefix, columns, index=None):
+    # DataFrame over the mapped columns; only string columns are materialized
+    data = {}
+    for i, column in enumerate(columns):
+        values = _map(os.path.join(directory, f"{prefix}.{i}.npy"))
+        if "categories" in column:
+            dtype = pd.CategoricalDtype(column["categories"], ordered=column.get("ordered", False))
+            values = pd.Categorical.from_codes(values, dtype=dtype, validate=False)
+            if column.get("str"):
+                values = values.astype(str)
+        data[column["name"]] = values
+    return pd.DataFrame(data, index=index, copy=False)
+
+
+def build_store(engine, directory, version):
+    # Write into a temporary directory and swap it in, so workers never map a half-written store
+    parent = os.path.dirname(os.path.abspath(directory))
+    tmp_dir = tempfile.mkdtemp(prefix=".shared_store.", dir=parent)
+    try:
+        os.chmod(tmp_dir, 0o755)
+        df = engine.df
+        np.save(os.path.join(tmp_dir, "index.npy"), df.index.to_numpy())
+        arrays = engine.arrays()
+        for name, values in arrays.items():
+            np.save(os.path.join(tmp_dir, f"engine.{name}.npy"), values)
+        manifest = {"version": version, "rows": len(df), "index": df.index.name,
+                    "columns": _save_frame(tmp_dir, "column", df),
+                    "regions": engine.regions, "crops": engine.crops, "arrays": list(arrays),
+                    # Rollup cube cells as RollupCube sorted them
+                    "cells": _save_frame(tmp_dir, "cell", RollupCube(engine.rollup_cells()).cells)}
+        # The manifest goes last: a directory without one is never mapped
+        with open(os.path.join(tmp_dir, MANIFEST_NAME), "w") as f:
+            json.dump(manifest, f)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    stale_dir = tmp_dir + ".stale"
+    if os.path.exists(directory):
+        os.rename(directory, stale_dir)
+    os.rename(tmp_dir, directory)
+    shutil.rmtree(stale_dir, ignore_errors=True)
+
+
+def map_engine(directory):
+    # FilterEngine over the read-only mapped store (nothing is copied)
+    manifest = _read_json(os.path.join(directory, MANIFEST_NAME))
+    index = pd.Index(_map(os.path.join(directory, "index.npy")), name=manifest["index"], copy=False)
+    df = _map_frame(directory, "column", manifest["columns"], index)
+    arrays = {name: _map(os.path.join(directory, f"engine.{name}.npy")) for name in manifest["arrays"]}
+    return FilterEngine.from_arrays(df, manifest["regions"], manifest["crops"], arrays)
+
+
+def map_cube(directory):
+    # RollupCube over the mapped cells; only its crop / region labels and marginals are per worker
+    manifest = _read_json(os.path.join(directory, MANIFEST_NAME))
+    return RollupCube(_map_frame(directory, "cell", manifest["cells"]), presorted=True)
+
+
+def open_engine(directory, version, build, log=print):
+    # Map the store, first (re)building it from build() -> FilterEngine when it is
+    # missing or holds another dataset version or store format
+    version = f"{version}/{STORE_FORMAT}"
+    if stored_version(directory) != version:
+        with _locked(directory):
+            # Another worker may have built it while this one waited for the lock
+            if stored_version(directory) != version:
+                build_store(build(), directory, version)
+                log(f"Wrote the shared dataset store {directory}")
+    return map_engine(directory)
+
+
+def load_geo_index(directory, path):
+    # GeoIndex of the GeoJSON at path, with the points and bounds computed by
+    # Shapely once and kept in the store for the other workers
+    stat = os.stat(path)
+    version = f"{os.path.abspath(path)}:{stat.st_size}-{stat.st_mtime_ns}"
+    geometry_path = os.path.join(directory, GEOMETRY_NAME)
+    saved = _read_json(geometry_path)
+    if saved and saved.get("version") == version:
+        return GeoIndex.from_file(path, saved["shapes"])
+
+    geo = GeoIndex.from_file(path)
+    with _locked(directory):
+        tmp_path = f"{geometry_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"version": version, "shapes": geo.shapes()}, f)
+        os.replace(tmp_path, geometry_path)
+    return geo
@@ -0,0 +1,153 @@
+# SQLite storage backend for the dashboard
+#
+# Alternative to the in-memory FilterEngine (CROP_DATA_BACKEND=sqlite). The
+# cleaned dataset is bulk-loaded once into an on-disk SQLite file using
+# crop_data_schema.sql, which also creates the (crop, region, year) indexes.
+# Region/crop/year filters run as SQL, so worker processes share one store on
+# disk instead of each holding the table. The rollup cube's cells are
+# aggregated with GROUP BY once, when the store is built, and kept in the
+# rollup_cells table; is_outlier is computed by the filter query.
+
+import os
+import sqlite3
+import threading
+
+import pandas as pd
+
+from outliers import MIN_ROWS
+from rollup import CROSS_PRODUCTS, MEASURES, cross_product_column
+
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "crop_data_schema.sql")
+COLUMNS = ['region', 'crop', 'year', 'yield_hg_ha', 'yield_t_ha', 'rainfall_mm', 'avg_temp_c', 'pesticide_t']
+
+# Bump when the stored tables change, so old stores are rebuilt
+STORE_FORMAT = 2
+
+
+def rollup_query():
+    # Per (crop, region, year) aggregates for the rollup cube (see rollup.cells_from_frame)
+    stats = ", ".join(f"{fn}({m}) AS {m}_{fn.lower()}" for m in MEASURES for fn in ("SUM", "MIN", "MAX"))
+    stats += ", " + ", ".join(f"COUNT({m}) AS {m}_n" for m in MEASURES)
+    # Sufficient statistics over rows where every measure is present
+    complete = " AND ".join(f"{m} IS NOT NULL" for m in MEASURES)
+    moments = ", ".join(
+        [f"SUM(CASE WHEN {complete} THEN 1 ELSE 0 END) AS n_complete"]
+        + [f"SUM(CASE WHEN {complete} THEN {m} ELSE 0 END) AS cs_{m}" for m in MEASURES]
+        + [f"SUM(CASE WHEN {complete} THEN {a} * {b} ELSE 0 END) AS {cross_product_column(a, b)}"
+           for a, b in CROSS_PRODUCTS])
+    return (f"SELECT crop, region, year, COUNT(*) AS count, {stats}, {moments} FROM crop_yields "
+            "GROUP BY crop, region, year ORDER BY crop, region, year")
+
+
+def build_database(df, path, version, schema_path=SCHEMA_PATH):
+    # Write to a temporary file and swap it in, so concurrent workers never see a half-built store
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    con = sqlite3.connect(tmp_path)
+    try:
+        with open(schema_path) as f:
+            con.executescript(f.read())
+        con.execute("CREATE TABLE dataset_meta (key TEXT PRIMARY KEY, value TEXT)")
+        # float32 columns go through their shortest decimal form so SQLite stores 16.37, not 16.3700008
+        data = df[COLUMNS].astype({'region': str, 'crop': str})
+        for col in data.columns[data.dtypes == 'float32']:
+            data[col] = data[col].astype(str).astype('float64')
+        with con:
+            rows = data.itertuples(index=False, name=None)
+            con.executemany(f"INSERT INTO crop_yields VALUES ({', '.join('?' * len(COLUMNS))})",
+                            ((r, c, int(y), *map(float, rest)) for r, c, y, *rest in rows))
+            con.execute(f"CREATE TABLE rollup_cells AS {rollup_query()}")
+            con.execute("INSERT INTO dataset_meta VALUES ('version', ?)", (version,))
+        con.execute("ANALYZE")
+    finally:
+        con.close()
+    os.replace(tmp_path, path)
+
+
+def stored_version(path):
+    if not os.path.exists(path):
+        return None
+    con = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        row = con.execute("SELECT value FROM dataset_meta WHERE key = 'version'").fetchone()
+        return row[0] if row else None
+    except sqlite3.DatabaseError:
+        return None
+    finally:
+        con.close()
+
+
+class SQLiteBackend:
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+        # Distinct values, year range and the global yield z-score band (is_outlier, as in core.load_frame)
+        self.regions = [r for (r,) in self._query("SELECT DISTINCT region FROM crop_yields ORDER BY region")]
+        self.crops = [c for (c,) in self._query("SELECT DISTINCT crop FROM crop_yields ORDER BY crop")]
+        count, min_year, max_year, mean, mean_sq = self._query(
+            "SELECT COUNT(*), MIN(year), MAX(year), AVG(yield_t_ha), AVG(yield_t_ha * yield_t_ha) FROM crop_yields")[0]
+        self._count = count
+        self.min_year, self.max_year = min_year or 0, max_year or 0
+        std = max((mean_sq - mean * mean) * count / (count - 1), 0) ** 0.5 if count > 1 else 0
+        self._outlier_mean = mean or 0
+        # No outliers when the table is too small or has no spread (OutlierEngine leaves those unscored)
+        self._outlier_band = 2 * std if count >= MIN_ROWS and std > 0 else float("inf")
+
+    @classmethod
+    def open(cls, path, version, build):
+        # (Re)build the store from build() -> DataFrame only when it is missing or
+        # holds another dataset version or format; a current store is opened without reading the dataset
+        version = f"{version}/{STORE_FORMAT}"
+        if stored_version(path) != version:
+            build_database(build(), path, version)
+        return cls(path)
+
+    def __len__(self):
+        return self._count
+
+    def _connection(self):
+        # One read-only connection per thread
+        con = getattr(self._local, "con", None)
+        if con is None:
+            con = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+            self._local.con = con
+        return con
+
+    def _query(self, sql, params=()):
+        return self._connection().execute(sql, params).fetchall()
+
+    def _where(self, regions, crops, years):
+        clauses, params = [], []
+        if crops:
+            clauses.append(f"crop IN ({', '.join('?' * len(crops))})")
+            params += list(crops)
+        if regions:
+            clauses.append(f"region IN ({', '.join('?' * len(regions))})")
+            params += list(regions)
+        if years is not None:
+            clauses.append("year BETWEEN ? AND ?")
+            params += [int(years[0]), int(years[1])]
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def filter(self, regions=None, crops=None, years=None):
+        where, params = self._where(regions, crops, years)
+        sql = (f"SELECT {', '.join(COLUMNS)}, ABS(yield_t_ha - ?) > ? AS is_outlier "
+               f"FROM crop_yields{where} ORDER BY crop, region, year")
+        dff = pd.read_sql_query(sql, self._connection(), params=[self._outlier_mean, self._outlier_band] + params)
+        dff['yield_hg_ha'] = dff['yield_hg_ha'].astype('int32')
+        dff['is_outlier'] = dff['is_outlier'].astype(bool)
+        return dff
+
+    def columns(self, names):
+        # Only the given columns of every row, in (crop, region, year) order
+        sql = f"SELECT {', '.join(names)} FROM crop_yields ORDER BY crop, region, year"
+        return pd.read_sql_query(sql, self._connection())
+
+    def rollup_cells(self):
+        # The rollup cube's cells, aggregated when the store was built
+        cells = pd.read_sql_query("SELECT * FROM rollup_cells", self._connection())
+        cells['year'] = cells['year'].astype('int16')
+        return cells
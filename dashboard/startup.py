@@ -0,0 +1,110 @@
+# Startup timing and lazy loading for the dashboard
+#
+# Heavy dependencies (folium, branca, plotly express) and precomputations that
+# only some tabs need (region geometry, tab 4 aggregates, outlier engine) are
+# loaded on first use through load() / Lazy instead of at import, so a worker
+# can serve its first request sooner. warm_up() loads them on a background
+# thread right after startup, so usually nobody waits for them.
+#
+# Every step is timed: report() prints the import time per module and the
+# steps done at startup, in the warm-up and on first use.
+
+import importlib
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+WARMUP_THREAD = "crop-warmup"
+
+timings = []                                    # (step, seconds, when)
+_lock = threading.Lock()
+_load_lock = threading.RLock()
+_started = time.perf_counter()
+_ready = None                                   # seconds until the app was importable
+
+
+def _when():
+    if threading.current_thread().name == WARMUP_THREAD:
+        return "warm-up"
+    return "startup" if _ready is None else "first use"
+
+
+@contextmanager
+def timed(step, log=print):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds, when = time.perf_counter() - start, _when()
+        with _lock:
+            timings.append((step, seconds, when))
+        # Startup and warm-up steps are reported together; a request paying for a load is worth a line of its own
+        if when == "first use":
+            log(f"First use: {step} {seconds * 1000:.0f} ms")
+
+
+def load(name):
+    # Module `name`, imported (and timed) on the first call; one thread imports, the others wait for it.
+    # Once imported no lock is taken, so callbacks never queue behind a warm-up import of another
+    # module; a module still being executed by another thread counts as not imported yet
+    module = sys.modules.get(name)
+    if module is not None and not getattr(module.__spec__, "_initializing", False):
+        return module
+    with _load_lock:
+        if name in sys.modules:
+            return importlib.import_module(name)
+        with timed(name):
+            return importlib.import_module(name)
+
+
+class Lazy:
+    # Value built by func() on first get(); concurrent callers wait for the same build
+
+    def __init__(self, step, func):
+        self.step = step
+        self._func = func
+        self._lock = threading.Lock()
+        self._done = False
+        self._value = None
+
+    def get(self):
+        if not self._done:
+            with self._lock:
+                if not self._done:
+                    with timed(self.step):
+                        self._value = self._func()
+                    self._done = True
+        return self._value
+
+
+def ready(log=print):
+    # Mark the end of startup and print what it was spent on
+    global _ready
+    _ready = time.perf_counter() - _started
+    report("startup", _ready, log)
+
+
+def report(when, total, log=print):
+    # Steps may nest (a Lazy value importing a module), so the total is measured separately
+    with _lock:
+        steps = [(step, seconds) for step, seconds, w in timings if w == when]
+    log(f"{when.capitalize()} took {total * 1000:.0f} ms")
+    for step, seconds in steps:
+        log(f"  {step:<32} {seconds * 1000:8.0f} ms")
+
+
+def warm_up(loaders, log=print):
+    # Run the lazy loaders on a background thread; failures are left for first use to report
+    def run():
+        start = time.perf_counter()
+        for loader in loaders:
+            try:
+                loader()
+            except Exception as e:
+                log(f"Warm-up step failed: {e!r}")
+        report("warm-up", time.perf_counter() - start, log)
+
+    thread = threading.Thread(target=run, name=WARMUP_THREAD, daemon=True)
+    thread.start()
+    return thread
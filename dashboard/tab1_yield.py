@@ -0,0 +1,147 @@
+# Tab 1: yield over time, plus the filtered data download
+
+from urllib.parse import urlencode
+
+import dash
+from dash import dcc, html, Input, Output, Patch, ctx
+from flask import Response, abort, request
+import numpy as np
+from plotly.colors import qualitative
+
+from core import app, server, engine, cube, crop_colors, filter_cache, theme_patch
+from downsample import MAX_POINTS, decimate, relayout_ranges
+from exports import FORMATS, available_formats, stream
+from instrumentation import instrument, phase
+from selection import unpack
+from startup import load
+
+# Every crop with a fixed color (the unlisted ones in plotly's default order) and the
+# traces in crop name order, so a chart type switch can restyle the traces on screen
+YIELD_COLORS = {**{crop: qualitative.Plotly[i % len(qualitative.Plotly)]
+                   for i, crop in enumerate(c for c in engine.crops if c not in crop_colors)},
+                **crop_colors}
+
+
+def layout(regions, crops, years, theme):
+    return html.Div([
+        dcc.Dropdown(
+            id='chart_type',
+            options=[
+                {"label": "📈 Line Chart", "value": "line"},
+                {"label": "📊 Bar Chart", "value": "bar"}
+            ],
+            value='line', clearable=False, className="mb-3"
+        ),
+        dcc.Graph(id='yield-graph'),
+        html.Div([
+            dcc.Dropdown(
+                id="download-format",
+                options=[{"label": FORMATS[f][0], "value": f} for f in available_formats()],
+                value="csv", clearable=False, style={"width": "180px"}
+            ),
+            html.A("💾 Download Filtered Data", id="download-link", className="btn btn-outline-secondary")
+        ], className="d-flex align-items-center gap-2 mt-2")
+    ])
+
+# Yield chart updater
+@app.callback(
+    Output("yield-graph", "figure"),
+    [Input("chart_type", "value"),
+     Input("shared-filters", "data"),
+     Input("theme-toggle", "value"),
+     Input("yield-graph", "relayoutData")]
+)
+
+def update_yield_graph(chart_type, filters, theme, relayout):
+    regions, crops, years = unpack(filters)
+    # Theme and chart type changes patch the figure on screen; only data changes rebuild it
+    if ctx.triggered_id == "theme-toggle":
+        return theme_patch(theme)
+    if ctx.triggered_id == "chart_type":
+        with phase("filter"):
+            selected = cube.select(regions, crops, years)
+        if selected['count'].sum() <= MAX_POINTS:
+            return chart_type_patch(chart_type, sorted(map(str, selected['crop'].unique())))
+
+    # Zooming only re-renders charts that were drawn with fewer points than rows
+    zoom = None
+    if relayout and ctx.triggered_id == "yield-graph":
+        zoom = relayout_ranges(relayout)
+        if zoom is None or cube.select(regions, crops, years)['count'].sum() <= MAX_POINTS:
+            return dash.no_update
+    x_range, y_range = zoom if zoom and zoom != "reset" else (None, None)
+    if x_range:
+        years = [max(years[0], int(np.floor(x_range[0]))), min(years[1], int(np.ceil(x_range[1])))]
+
+    with phase("filter"):
+        dff = filter_cache.filter(regions, crops, years)
+
+    px = load("plotly.express")
+    style = dict(color="crop", template=theme, color_discrete_map=YIELD_COLORS,
+                 category_orders={"crop": sorted(map(str, dff['crop'].unique()))})
+    with phase("figure"):
+        if len(dff) <= MAX_POINTS:
+            if chart_type == 'bar':
+                fig = px.bar(dff, x="year", y="yield_t_ha", barmode="group", **style)
+            else:
+                fig = px.line(dff, x="year", y="yield_t_ha", **style)
+        elif chart_type == 'bar':
+            # Grouped bars of one crop and year overlap, so only the tallest is visible
+            tallest = dff.groupby(['year', 'crop'], observed=True, sort=False)['yield_t_ha'].max().reset_index()
+            fig = px.bar(tallest, x="year", y="yield_t_ha", barmode="group", **style)
+        else:
+            # LTTB keeps the shape of every crop's line within the point budget, drawn with WebGL
+            shown = decimate(dff, 'crop', 'yield_t_ha', MAX_POINTS)
+            fig = px.line(shown, x="year", y="yield_t_ha", render_mode='webgl', **style)
+            fig.update_layout(title=f"{len(shown)} of {len(dff)} points shown, zoom in for detail")
+        if x_range:
+            fig.update_xaxes(range=x_range)
+        if y_range:
+            fig.update_yaxes(range=y_range)
+        return fig
+
+def chart_type_patch(chart_type, crops):
+    # Switch the traces on screen (one per crop, in name order) between lines and grouped
+    # bars; below MAX_POINTS both chart types plot the same rows
+    patch = Patch()
+    for i, crop in enumerate(crops):
+        if chart_type == 'bar':
+            patch["data"][i]["type"] = "bar"
+            patch["data"][i]["marker"]["color"] = YIELD_COLORS[crop]
+        else:
+            patch["data"][i]["type"] = "scatter"
+            patch["data"][i]["mode"] = "lines"
+            patch["data"][i]["line"]["color"] = YIELD_COLORS[crop]
+    patch["layout"]["barmode"] = "group"
+    return patch
+
+# Download link: the callback only builds the URL of the selection; the rows are
+# streamed in chunks by the /download/filtered route when the link is clicked
+@app.callback(
+    [Output("download-link", "href"),
+     Output("download-link", "download")],
+    [Input("download-format", "value"),
+     Input("shared-filters", "data")]
+)
+def update_download_link(fmt, filters):
+    regions, crops, years = unpack(filters)
+    query = [("format", fmt)] + [("region", r) for r in regions or []] + [("crop", c) for c in crops or []]
+    query += [("from", years[0]), ("to", years[1])]
+    filename = "filtered_crop_data" + FORMATS[fmt][1]
+    return app.get_relative_path("/download/filtered") + "?" + urlencode(query), filename
+
+@server.route("/download/filtered")
+@instrument
+def download_filtered_data():
+    # Only the filter runs before the first chunk is sent (see exports.py)
+    fmt = request.args.get("format", "csv")
+    if fmt not in available_formats():
+        abort(400)
+    years = [request.args.get("from", engine.min_year, type=int), request.args.get("to", engine.max_year, type=int)]
+    if years[0] > years[1]:
+        abort(400)                                  # years outside the data are clamped by the filter
+    with phase("filter"):
+        dff = filter_cache.filter(request.args.getlist("region") or None, request.args.getlist("crop") or None, years)
+    _, extension, mimetype = FORMATS[fmt]
+    return Response(stream(dff, fmt), mimetype=mimetype,
+                    headers={"Content-Disposition": f'attachment; filename="filtered_crop_data{extension}"'})
@@ -0,0 +1,90 @@
+# Tab 2: correlation explorer scatters
+
+import dash
+from dash import html, Input, State, MATCH
+import dash_bootstrap_components as dbc
+import pandas as pd
+import plotly.graph_objects as go
+
+import compact_figures
+from core import app, cube, filter_cache
+from downsample import MAX_POINTS, DENSITY_POINTS, density, relayout_ranges
+from instrumentation import phase
+from selection import unpack
+from startup import load
+
+
+def layout(regions, crops, years, theme):
+    with phase("filter"):
+        dff = filter_cache.filter(regions, crops, years)
+    with phase("figure"):
+        figA = scatter_figure("rainfall", dff, theme)
+        figB = scatter_figure("pesticide", dff, theme)
+
+    return html.Div([
+        dbc.Row([dbc.Col(compact_figures.graph({"type": "tab2-scatter", "chart": "rainfall"}, figA))]),
+        dbc.Row([dbc.Col(compact_figures.graph({"type": "tab2-scatter", "chart": "pesticide"}, figB))])
+    ])
+
+# Tab 2 scatters: SVG up to MAX_POINTS rows, WebGL up to DENSITY_POINTS, binned density above
+TAB2_SCATTERS = {
+    "rainfall": dict(x="rainfall_mm", color="avg_temp_c", hover_data={'crop': True, 'year': True, 'region': True},
+                     title="Rainfall vs Yield (colored by Avg Temp)"),
+    "pesticide": dict(x="pesticide_t", color="crop", hover_data={'region': True, 'year': True},
+                      title="Pesticide Use vs Yield (by Crop)"),
+}
+
+def scatter_figure(chart, dff, theme, x_range=None, y_range=None):
+    spec = TAB2_SCATTERS[chart]
+    if x_range:
+        dff = dff[dff[spec['x']].between(*x_range)]
+    if y_range:
+        dff = dff[dff['yield_t_ha'].between(*y_range)]
+
+    if len(dff) <= DENSITY_POINTS:
+        px = load("plotly.express")
+        fig = px.scatter(dff, x=spec['x'], y="yield_t_ha", color=spec['color'], hover_data=spec['hover_data'],
+                         template=theme, title=spec['title'],
+                         render_mode='webgl' if len(dff) > MAX_POINTS else 'svg')
+    else:
+        # Numeric colors become the mean per bin, categorical ones the row count per bin
+        numeric = pd.api.types.is_numeric_dtype(dff[spec['color']])
+        xc, yc, counts, means = density(dff[spec['x']], dff['yield_t_ha'], x_range, y_range,
+                                        weights=dff[spec['color']] if numeric else None)
+        # Counts colored by themselves are not sent a second time as customdata
+        fig = go.Figure(go.Heatmap(
+            x=xc, y=yc, z=means if numeric else counts, customdata=counts if numeric else None,
+            colorscale='Plasma' if numeric else 'Viridis',
+            colorbar=dict(title=spec['color'] if numeric else 'rows'),
+            hovertemplate=f"{spec['x']}: %{{x:.4g}}<br>yield_t_ha: %{{y:.4g}}<br>"
+                          f"rows: %{{{'customdata' if numeric else 'z'}}}<extra></extra>"))
+        fig.update_layout(template=theme, title=f"{spec['title']}: density of {len(dff)} rows, zoom in for detail",
+                          xaxis_title=spec['x'], yaxis_title="yield_t_ha")
+    if x_range:
+        fig.update_xaxes(range=x_range)
+    if y_range:
+        fig.update_yaxes(range=y_range)
+    return fig
+
+# Re-render a zoomed tab 2 scatter at the detail the visible rows allow
+compact_figures.register(app, {"type": "tab2-scatter", "chart": MATCH})
+
+@app.callback(
+    compact_figures.output({"type": "tab2-scatter", "chart": MATCH}),
+    Input({"type": "tab2-scatter", "chart": MATCH}, "relayoutData"),
+    [State({"type": "tab2-scatter", "chart": MATCH}, "id"),
+     State("shared-filters", "data"), State("theme-toggle", "value")],
+    prevent_initial_call=True
+)
+def update_scatter_detail(relayout, graph_id, filters, theme):
+    regions, crops, years = unpack(filters)
+    # Below DENSITY_POINTS the browser already holds every row
+    zoom = relayout_ranges(relayout)
+    if zoom is None or cube.select(regions, crops, years)['count'].sum() <= DENSITY_POINTS:
+        return dash.no_update
+    with phase("filter"):
+        dff = filter_cache.filter(regions, crops, years)
+    with phase("figure"):
+        if zoom == "reset":
+            return compact_figures.value(scatter_figure(graph_id["chart"], dff, theme))
+        return compact_figures.value(scatter_figure(graph_id["chart"], dff, theme, *zoom))
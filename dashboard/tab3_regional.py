@@ -0,0 +1,17 @@
+# Tab 3: regional comparison in the last selected year
+
+from dash import dcc
+
+from core import cube
+from instrumentation import phase
+from startup import load
+
+
+def layout(regions, crops, years, theme):
+    with phase("filter"):
+        latest = cube.mean(['crop', 'region'], 'yield_t_ha', regions, crops, [years[1], years[1]]).reset_index()
+    px = load("plotly.express")
+    with phase("figure"):
+        fig = px.bar(latest, x="region", y="yield_t_ha", color="crop", template=theme,
+                     barmode='group', title=f"Regional Yield in {years[1]}")
+    return dcc.Graph(id={"type": "themed-graph", "name": "tab3-regional"}, figure=fig)
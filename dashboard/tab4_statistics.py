@@ -0,0 +1,94 @@
+# Tab 4: statistical analysis (averages, trend, correlation, regression, outliers)
+
+from dash import dcc, html, Input, Output
+import dash_bootstrap_components as dbc
+import plotly.graph_objects as go
+
+from core import app, cube, outlier_engine
+from instrumentation import phase
+from selection import unpack
+from outliers import METHODS, GROUPINGS, WINDOWS
+from startup import Lazy, load
+
+
+# Average yield per crop and region (cube marginals)
+def marginal_mean(marginal):
+    return (marginal['yield_t_ha_sum'] / marginal['yield_t_ha_n']).rename('yield_t_ha')
+
+def overview_tables():
+    avg_yield_by_crop = marginal_mean(cube.by_crop).sort_values(ascending=False).reset_index()
+    avg_yield_by_region = marginal_mean(cube.by_region).sort_values(ascending=False).reset_index()
+
+    # Yearly yield percentage change
+    yearly_yield = marginal_mean(cube.by_year).reset_index()
+    yearly_yield['% Change'] = yearly_yield['yield_t_ha'].pct_change().round(4) * 100
+    return avg_yield_by_crop, avg_yield_by_region, yearly_yield
+
+# Whole-table overview, computed once on first use
+overview = Lazy("tab 4 overview", overview_tables)
+
+# Correlation matrix and linear regression (yield ~ rainfall + temp + pesticide)
+# are solved per selection from the cube's sufficient statistics
+
+def layout(regions, crops, years, theme):
+    avg_yield_by_crop, avg_yield_by_region, yearly_yield = overview.get()
+    px = load("plotly.express")
+    with phase("figure"):
+        fig1 = px.bar(avg_yield_by_crop, x='crop', y='yield_t_ha', title='Average Yield by Crop', template='plotly_white')
+        fig2 = px.bar(avg_yield_by_region, x='region', y='yield_t_ha', title='Average Yield by Region', template='plotly_white')
+        fig3 = px.line(yearly_yield, x='year', y='yield_t_ha', title='Yield Trend Over Time', template='plotly_white')
+    # Correlation and regression follow the region/crop/year filters
+    with phase("filter"):
+        corr_matrix = cube.correlation(regions, crops, years).round(2)
+        r2, coefs = cube.regression(regions, crops, years)
+    fig4 = go.Figure(go.Heatmap(z=corr_matrix.values, x=corr_matrix.columns, y=corr_matrix.index,
+                                colorscale='Viridis', zmin=-1, zmax=1))
+    fig4.update_layout(title='Correlation Matrix (current selection)', template='plotly_white')
+
+    if coefs:
+        regression_note = f"R2: {r2:.3f}, Coefs: {coefs}"
+    else:
+        regression_note = "Not enough data in the current selection for a regression"
+
+    return html.Div([
+        dbc.Row([dbc.Col(dcc.Graph(figure=fig1))]),
+        dbc.Row([dbc.Col(dcc.Graph(figure=fig2))]),
+        dbc.Row([dbc.Col(dcc.Graph(figure=fig3))]),
+        dbc.Row([dbc.Col(dcc.Graph(figure=fig4))]),
+        html.Hr(),
+        dbc.Row([
+            dbc.Col([html.Label("Outlier Method:"), dcc.Dropdown(
+                id="outlier-method", options=[{"label": v, "value": k} for k, v in METHODS.items()],
+                value="zscore", clearable=False)], md=3),
+            dbc.Col([html.Label("Compare Against:"), dcc.Dropdown(
+                id="outlier-grouping", options=[{"label": v, "value": k} for k, v in GROUPINGS.items()],
+                value="global", clearable=False)], md=3),
+            dbc.Col([html.Label("Year Window:"), dcc.Dropdown(
+                id="outlier-window",
+                options=[{"label": f"{w} years" if w else "All years", "value": w} for w in WINDOWS],
+                value=0, clearable=False)], md=3),
+            dbc.Col([html.Label("Score Threshold:"), dcc.Input(
+                id="outlier-threshold", type="number", value=2, min=0.5, step=0.5)], md=3),
+        ], className="mb-2"),
+        html.Div(id="outlier-summary"),
+        html.H5(regression_note, className="text-primary fw-bold"),
+        html.H5("% Change is Yield by Year:", className="mt-4"),
+        dbc.Table.from_dataframe(yearly_yield.tail(10), striped=True, bordered=True, hover=True)
+    ])
+
+# Tab 4 outlier summary for the selected method, grouping and window
+@app.callback(
+    Output("outlier-summary", "children"),
+    [Input("outlier-method", "value"), Input("outlier-grouping", "value"),
+     Input("outlier-window", "value"), Input("outlier-threshold", "value"),
+     Input("shared-filters", "data")]
+)
+def update_outlier_summary(method, grouping, window, threshold, filters):
+    threshold = threshold if threshold else 2
+    with phase("filter"):
+        flagged, scored, by_crop = outlier_engine.get().summary(*unpack(filters), method, grouping, window, threshold)
+    children = [html.H5(f"Outliers Detected: {flagged} of {scored} scored rows", className="text-danger fw-bold")]
+    if len(by_crop):
+        table = by_crop.sort_values(ascending=False).rename_axis('crop').reset_index()
+        children.append(dbc.Table.from_dataframe(table, striped=True, bordered=True, hover=True, size="sm"))
+    return children
@@ -0,0 +1,179 @@
+# Tab 5: Folium choropleth of a weather / pesticide metric in one year
+
+import atexit
+import os
+from urllib.parse import urlencode
+
+import dash
+from dash import dcc, html, Input, Output, State, ctx
+from flask import abort, request
+import pandas as pd
+
+from core import (app, server, engine, cube, geo_index, map_version, map_store, job_queue, job_slot, job_outputs,
+                  MAP_ZOOM, JOB_POLL_MS)
+from instrumentation import instrument, metrics, phase
+from jobs import no_progress
+from map_cache import RenderCache
+from startup import load
+
+TAB5_METRICS = ['rainfall_mm', 'avg_temp_c', 'pesticide_t']
+
+# Rendered choropleth HTML keyed on (metric, year, map version), bounded by entries and bytes
+tab5_cache = RenderCache(
+    max_entries=int(os.environ.get("TAB5_CACHE_ENTRIES", 128)),
+    max_bytes=int(os.environ.get("TAB5_CACHE_MB", 64)) * 1024 * 1024
+)
+TAB5_REQUESTS_PATH = ".tab5_map_requests.json"
+metrics.register_cache("tab5", tab5_cache)
+
+
+def valid_map(metric, year):
+    # Only metrics and years of the data; anything else would render (and cache) an empty map
+    return metric in TAB5_METRICS and year is not None and engine.min_year <= year <= engine.max_year
+
+
+def layout(regions, crops, years, theme):
+    return html.Div([
+        html.Div([
+            html.Label("Select Metric:"),
+            dcc.Dropdown(
+                id="metric-dropdown",
+                options=[{"label": m, "value": m} for m in TAB5_METRICS],
+                value="rainfall_mm",
+                clearable=False, style={"width": "300px"}
+            ),
+            html.Br(),
+            html.Label("Select Year:"),
+
+            dcc.Slider(
+                id="year-slider",
+                min=engine.min_year,
+                max=engine.max_year,
+                value=engine.max_year,  # default selected year
+                step=1,
+                marks={str(y): str(y) for y in range(engine.min_year, engine.max_year + 1, 5)},
+                tooltip={"placement": "bottom", "always_visible": True}
+            )
+
+        ], className="mb-3"),
+        html.Div(id="tab5-job-status", className="mb-2"),
+        dcc.Interval(id="tab5-job-poll", interval=JOB_POLL_MS, disabled=True),
+        html.Iframe(id="folium-map", style={"height": "600px", "width": "100%", "border": "none"})
+    ])
+
+def create_colormap_tab5(values):
+    cm = load("branca.colormap")
+    clean_values = values.dropna()
+    if len(clean_values) == 0:
+        return cm.LinearColormap(['#ffffff', '#ffffff'], vmin=0, vmax=1)
+
+    # Plasma-style hex codes (manually extracted from matplotlib plasma)
+    plasma_colors = [
+        "#0d0887", "#6a00a8", "#b12a90", "#e16462",
+        "#fca636", "#f0f921"
+    ]
+
+    return cm.LinearColormap(plasma_colors, vmin=clean_values.min(), vmax=clean_values.max())
+
+def generate_tab5_folium_map(metric, target_year, progress=no_progress):
+    folium = load("folium")
+    region_value_map = cube.mean('region', metric, years=[target_year, target_year]).to_dict()
+    progress(0.2, "Building the map")
+
+    m = folium.Map(location=[20, 0], zoom_start=MAP_ZOOM, tiles='CartoDB Positron')
+    value_series = pd.Series(region_value_map.values())
+    colormap = create_colormap_tab5(value_series)
+    colormap.caption = f"Average {metric.replace('_', ' ').title()}"
+    colormap.add_to(m)
+
+    def style_function(feature):
+        region = feature['properties']['name']
+        value = region_value_map.get(region)
+        return {
+            'fillColor': colormap(value) if value is not None else '#d3d3d3',
+            'color': 'black',
+            'weight': 1,
+            'fillOpacity': 0.7
+        }
+
+    features = geo_index.get().overlay({metric: region_value_map})
+    progress(0.4, "Styling regions")
+    folium.GeoJson(
+        features,
+        style_function=style_function,
+        tooltip=folium.GeoJsonTooltip(
+            fields=['name', metric],
+            aliases=['Region:', f'{metric}:'],
+            localize=True,
+            sticky=True,
+            labels=True
+        )
+    ).add_to(m)
+
+    return m
+@app.callback(
+    [Output("folium-map", "src"),
+     Output("tab5-job-status", "children"),
+     Output("tab5-job-poll", "disabled")],
+    [Input("metric-dropdown", "value"),
+     Input("year-slider", "value"),
+     Input("tab5-job-poll", "n_intervals")],
+    State("client-id", "data")
+)
+def update_tab5_folium_map(metric, year, n_intervals, client):
+    # The iframe loads the map from the /maps/choropleth route once a background
+    # job has rendered it; the previous map stays visible meanwhile
+    if not valid_map(metric, year):
+        return dash.no_update, None, True
+    if ctx.triggered_id != "tab5-job-poll":
+        tab5_cache.count((metric, year))        # one view per selection, whichever cache serves it
+    key = (metric, year, map_version)
+    query = urlencode({"metric": metric, "year": year, "v": map_version})
+    src = lambda: app.get_relative_path("/maps/choropleth") + "?" + query
+    if map_store.has(key):
+        return src(), None, True
+    job = job_queue.submit(job_slot(client, "tab5"), key, instrument(
+        lambda progress: map_store.put(key, tab5_cache.get_or_render(key, lambda: render_tab5_map(key, progress))),
+        "render_tab5_map"
+    ))
+    return job_outputs(job, src)
+
+def render_tab5_map(key, progress=no_progress):
+    metric, year, _ = key
+    # progress() checkpoints between the steps stop a superseded job before the next one,
+    # and after the HTML is written, before the job stores it
+    progress(0.1, "Coloring regions")
+    with phase("figure"):
+        m = generate_tab5_folium_map(metric=metric, target_year=year, progress=progress)
+        progress(0.6, "Writing the map")
+        document = m.get_root().render()
+    progress(0.95, "Storing the map")
+    return document
+
+@server.route("/maps/choropleth")
+@instrument
+def choropleth_map():
+    metric = request.args.get("metric")
+    year = request.args.get("year", type=int)
+    if not valid_map(metric, year):
+        abort(400)
+    key = (metric, year, map_version)
+    return map_store.response(key, lambda: tab5_cache.get_or_render(key, lambda: render_tab5_map(key)))
+
+# Optional warm-up: CROP_MAP_WARMUP=<n> pre-renders the default view of every metric
+# followed by the most viewed (metric, year) maps of previous runs into the map store,
+# on the startup warm-up thread. View counts are saved on exit either way, so a later
+# warm-up has them.
+warmup_count = int(os.environ.get("CROP_MAP_WARMUP", 0))
+if warmup_count:
+    tab5_cache.load_requests(TAB5_REQUESTS_PATH)
+atexit.register(tab5_cache.save_requests, TAB5_REQUESTS_PATH)
+
+def warm_maps():
+    if not warmup_count:
+        return
+    default_keys = [(m, engine.max_year, map_version) for m in TAB5_METRICS]
+    popular_keys = [(m, y, map_version) for m, y, *_ in tab5_cache.most_requested(warmup_count)]
+    for key in list(dict.fromkeys(default_keys + popular_keys))[:warmup_count]:
+        if not map_store.has(key):
+            map_store.put(key, tab5_cache.get_or_render(key, lambda: render_tab5_map(key)))
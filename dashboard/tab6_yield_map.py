@@ -0,0 +1,122 @@
+# Tab 6: interactive yield map (dash_leaflet) with top yield markers
+#
+# The map, its tiles and the region geometry are created once per tab view; the
+# geometry is fetched by the browser from the static assets (and cached there).
+# A filter change only sends the GeoJSON layer's hideout, a region -> average
+# yield dictionary plus the color scale bounds, and the top yield markers;
+# assets/tab6_yield_map.js recolors the regions from the hideout.
+
+import os
+
+from dash import dcc, html, Input, Output
+import dash_bootstrap_components as dbc
+import dash_leaflet as dl
+
+from core import app, engine, cube, geo_index, MAP_ZOOM
+from instrumentation import phase
+from startup import load
+
+YIELD_COLORS = ['#ffffcc', '#c2e699', '#78c679', '#31a354', '#006837']
+MISSING_COLOR = '#ff0000'
+
+
+def geometry_url():
+    # Static asset URL of the geometry level for the initial zoom
+    path = load("geometry_lod").path_for_zoom(MAP_ZOOM)
+    return app.get_asset_url(os.path.relpath(path, "assets").replace(os.sep, "/"))
+
+def layout(regions, crops, years, theme):
+    return html.Div([
+        html.H4("Interactive Yield Map", className="mb-3"),
+        html.Div([
+            dbc.Row([
+                dbc.Col(html.Label("Select Year:"), width=2),
+                dbc.Col(dcc.Slider(
+                    id='folium-year-slider',
+                    min=engine.min_year,
+                    max=engine.max_year,
+                    value=engine.max_year,
+                    marks={str(y): str(y) for y in range(engine.min_year, engine.max_year+1, 5)},
+                    step=1,
+                    tooltip={"placement": "bottom", "always_visible": True}
+                ), width=8),
+                dbc.Col(html.Label("Filter Crops:"), width=2),
+                dbc.Col(dcc.Dropdown(
+                    id='folium-crop-filter',
+                    options=[{'label': c, 'value': c} for c in engine.crops],
+                    multi=True,
+                    placeholder="Filter by crop (select none for all)"
+                ), width=8)
+            ], className="mb-3"),
+            
+            html.H5([
+                "Global Crop Yield Visualizer ",
+                html.Small("Red regions indicate missing data", className="text-muted")
+            ], className="text-center"),
+            dl.Map(
+                center=[20, 0], zoom=MAP_ZOOM, minZoom=2, maxBounds=[[-90, -180], [90, 180]],
+                style={'width': '100%', 'height': '700px'},
+                children=[
+                    dl.TileLayer(url="https://{s}.basemaps.cartocdn.com/light_all/{z}/{x}/{y}{r}.png",
+                                 attribution="&copy; OpenStreetMap contributors &copy; CARTO"),
+                    dl.GeoJSON(
+                        id="tab6-regions", url=geometry_url(),
+                        style={"variable": "dashExtensions.tab6.style"},
+                        onEachFeature={"variable": "dashExtensions.tab6.onEachFeature"},
+                        hideout={"values": {}, "min": 0, "max": 1, "colors": YIELD_COLORS, "missing": MISSING_COLOR}
+                    ),
+                    dl.GeoJSON(id="tab6-markers", cluster=True, zoomToBoundsOnClick=True),
+                    dl.Colorbar(id="tab6-colorbar", colorscale=YIELD_COLORS, min=0, max=1, unit="t/ha",
+                                nTicks=5, width=250, height=12, position="bottomleft"),
+                    dl.ScaleControl(position="bottomright")
+                ]
+            )
+        ])
+    ])
+
+# Data-only update: the hideout of the region layer, the color bar bounds and the markers
+@app.callback(
+    [Output('tab6-regions', 'hideout'),
+     Output('tab6-colorbar', 'min'),
+     Output('tab6-colorbar', 'max'),
+     Output('tab6-markers', 'data')],
+    [Input('folium-year-slider', 'value'),
+     Input('folium-crop-filter', 'value'),
+     Input('shared-filters', 'data')]
+)
+def update_yield_map(year, crops, filters):
+    selection = dict(regions=filters['regions'], crops=crops or None, years=[year, year])
+    with phase("filter"):
+        max_yield = cube.top_cells('crop', 'yield_t_ha', **selection)
+        stats = cube.region_stats(**selection).to_dict('index')
+        region_yield = cube.mean('region', 'yield_t_ha', **selection)
+    values = {region: round(float(value), 2) for region, value in region_yield.items()}
+    vmin, vmax = (min(values.values()), max(values.values())) if values else (0, 1)
+    hideout = {"values": values, "min": vmin, "max": vmax, "colors": YIELD_COLORS, "missing": MISSING_COLOR}
+    with phase("figure"):
+        return hideout, vmin, vmax, top_yield_markers(max_yield, stats)
+
+def top_yield_markers(max_yield, stats):
+    # Clustered point features at the region centroids; dash_leaflet binds the popup and tooltip properties
+    geo = geo_index.get()
+    features = []
+    for row in max_yield.itertuples(index=False):
+        centroid = geo.centroid(row.region)
+        if not centroid or row.region not in stats:
+            continue
+        region_stat = stats[row.region]
+        popup = (
+            f"<div style='width: 220px; font-family: sans-serif;'>"
+            f"<h4 style='margin: 0 0 5px 0; color: #2b8cbe; border-bottom: 1px solid #eee; padding-bottom: 5px;'>{row.region}</h4>"
+            f"<p style='margin: 5px 0;'><b>Top Crop:</b> {row.crop}</p>"
+            f"<p style='margin: 5px 0;'><b>Record Yield:</b> {row.yield_t_ha_max:.1f} t/ha ({row.year})</p>"
+            f"<p style='margin: 5px 0;'><b>Avg Yield:</b> {region_stat['mean_yield']:.1f} t/ha</p>"
+            f"<p style='margin: 5px 0;'><b>Crops Grown:</b> {region_stat['crop_variety']}</p>"
+            f"</div>"
+        )
+        features.append({
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": [centroid[1], centroid[0]]},
+            "properties": {"popup": popup, "tooltip": f"{row.crop}: {row.yield_t_ha_max:.1f} t/ha"}
+        })
+    return {"type": "FeatureCollection", "features": features}
@@ -0,0 +1,144 @@
+# Tab 7: crop yield over time map, played back in the browser
+
+import json
+
+import dash
+from dash import dcc, html, Input, Output, State, ClientsideFunction
+import numpy as np
+
+from core import app, engine
+from instrumentation import phase
+from startup import load
+
+
+def layout(regions, crops, years, theme):
+    # Use fallback values if inputs are missing
+    selected_crops = crops if crops else engine.crops
+    min_year = engine.min_year
+    max_year = engine.max_year
+    year_marks = {str(year): str(year) for year in range(min_year, max_year + 1, 5)}
+
+    return html.Div([
+        html.H1("Crop Yield by Country Over Time 🚀", style={"textAlign": "center"}),
+
+        # Top filters
+        html.Div([
+            html.Div([
+                html.Label("Select Crop:"),
+                dcc.Dropdown(
+                    id='crop-dropdown-tab7',  # <-- unique ID
+                    options=[{'label': crop, 'value': crop} for crop in selected_crops],
+                    value=selected_crops[0] if isinstance(selected_crops, (list, np.ndarray)) else selected_crops,
+                    clearable=False
+                ),
+            ], style={"width": "20%", "padding": "10px"}),
+
+            html.Div([
+                html.Label("Select Year:"),
+                dcc.Slider(
+                    id='year-slider-tab7',  # <-- unique ID
+                    min=min_year,
+                    max=max_year,
+                    step=1,
+                    value=min_year,
+                    marks=year_marks,
+                    tooltip={"placement": "bottom", "always_visible": False}
+                ),
+            ], style={"width": "75%", "padding": "10px"})
+        ], style={
+            "display": "flex",
+            "width": "100%",
+            "alignItems": "center",
+            "justifyContent": "space-between"
+        }),
+
+        # Play/Pause button
+        html.Div([
+            html.Button("Pause Timeline", id="play-pause-btn", n_clicks=0, style={
+                "width": "100%",
+                "padding": "5px"
+            })
+        ], style={
+            "padding": "5px",
+            "margin": "0 auto",
+            "width": "20%",
+            "textAlign": "center"
+        }),
+
+        # Map display
+        dcc.Graph(id='yield-map-tab7', style={"height": "650px"}),
+
+        # Animation tools
+        dcc.Interval(
+            id='year-interval-tab7',
+            interval=1000,
+            n_intervals=0,
+            disabled=False
+        ),
+        dcc.Store(id='tab7-frames')
+    ])
+
+# --- Tab 7 timeline: frames are built once per crop, playback runs in the browser ---
+@app.callback(
+    Output('tab7-frames', 'data'),
+    Input('crop-dropdown-tab7', 'value')
+)
+def build_map_frames(selected_crop):
+    # Every year of the selected crop as a compact region x year value table
+    with phase("filter"):
+        dff = engine.filter(crops=[selected_crop]).drop_duplicates(['region', 'year'])
+    if dff.empty:
+        return dash.no_update
+    values = dff.pivot(index='year', columns='region', values='yield_hg_ha').dropna(axis=1, how='all').astype('Int64')
+
+    # Trace and layout styling come from plotly express once; assets/tab7_timeline.js
+    # fills in locations/z per year
+    first_year = dff[dff['year'] == values.index[0]]
+    px = load("plotly.express")
+    fig = px.choropleth(
+        first_year,
+        locations="region",
+        locationmode="country names",
+        color="yield_hg_ha",
+        hover_name="region",
+        color_continuous_scale="YlGnBu",
+        labels={"Crop_Yield": "Yield (hg/ha)"}
+    )
+    fig.update_layout(
+        geo=dict(showframe=False, showcoastlines=False),
+        coloraxis_colorbar=dict(title="Yield (hg/ha)")
+    )
+    fig_json = json.loads(fig.to_json())
+    trace = {k: v for k, v in fig_json['data'][0].items() if k not in ('locations', 'z', 'hovertext')}
+
+    return {
+        "crop": selected_crop,
+        "years": values.index.tolist(),
+        "regions": values.columns.tolist(),
+        "values": values.astype(object).where(values.notna(), None).values.tolist(),
+        "trace": trace,
+        "layout": fig_json['layout']
+    }
+
+app.clientside_callback(
+    ClientsideFunction(namespace='tab7', function_name='togglePlay'),
+    Output('year-interval-tab7', 'disabled'),
+    Output('play-pause-btn', 'children'),
+    Input('play-pause-btn', 'n_clicks'),
+    prevent_initial_call=True
+)
+
+app.clientside_callback(
+    ClientsideFunction(namespace='tab7', function_name='nextYear'),
+    Output('year-slider-tab7', 'value'),
+    Input('year-interval-tab7', 'n_intervals'),
+    Input('tab7-frames', 'data'),
+    State('year-slider-tab7', 'value')
+)
+
+app.clientside_callback(
+    ClientsideFunction(namespace='tab7', function_name='drawFrame'),
+    Output('yield-map-tab7', 'figure'),
+    Input('year-slider-tab7', 'value'),
+    Input('tab7-frames', 'data')
+)
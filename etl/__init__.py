@@ -0,0 +1,8 @@
+# ETL for the crop yield dashboard dataset (replaces data_cleanup.ipynb)
+#
+#   python -m etl            # incremental run from the repository root
+#   python -m etl --force    # ignore the stage cache
+
+from etl.pipeline import Pipeline, run_pipeline
+
+__all__ = ["Pipeline", "run_pipeline"]
@@ -0,0 +1,17 @@
+import argparse
+
+from etl.pipeline import CACHE_DIR, OUTPUTS, RESOURCES_DIR, run_pipeline
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m etl", description="Build the final_crop_data dataset from the Resources CSVs.")
+    parser.add_argument("--resources", default=RESOURCES_DIR, help="folder with pesticides/rainfall/temp/yield CSVs")
+    parser.add_argument("--cache-dir", default=CACHE_DIR, help="stage cache and fingerprint manifest")
+    parser.add_argument("--output", action="append", help="output path, .csv/.feather/.parquet (repeatable, default: %s)" % ", ".join(OUTPUTS))
+    parser.add_argument("--force", action="store_true", help="re-run every stage")
+    args = parser.parse_args()
+    run_pipeline(resources_dir=args.resources, cache_dir=args.cache_dir, outputs=args.output, force=args.force)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+# Dataset file formats for the ETL output
+#
+# Besides CSV the dataset can be written as Feather (Arrow IPC) or Parquet.
+# The binary formats store region/crop as categoricals, year as int16 and the
+# measures as float32, which is what the dashboard loader expects. They need
+# pyarrow; without it only the CSV outputs are written.
+
+import importlib.util
+
+BINARY_FORMATS = (".feather", ".parquet")
+
+COLUMN_DTYPES = {
+    'region': 'category',
+    'crop': 'category',
+    'year': 'int16',
+    'yield_hg_ha': 'int32',
+    'yield_t_ha': 'float32',
+    'rainfall_mm': 'float32',
+    'avg_temp_c': 'float32',
+    'pesticide_t': 'float32',
+}
+
+
+def has_pyarrow():
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+def to_columnar(df):
+    # Compact dtypes for the binary formats
+    return df.astype({col: dtype for col, dtype in COLUMN_DTYPES.items() if col in df.columns})
+
+
+def write_dataset(df, path):
+    if path.endswith(".feather"):
+        to_columnar(df).reset_index(drop=True).to_feather(path, compression="uncompressed")
+    elif path.endswith(".parquet"):
+        to_columnar(df).to_parquet(path, index=False)
+    else:
+        df.to_csv(path, index=False)
+
@@ -0,0 +1,125 @@
+# Incremental ETL pipeline producing the dashboard dataset
+#
+# Every stage records a fingerprint of its inputs (file contents or upstream
+# stage fingerprints) in the cache manifest. A re-run skips any stage whose
+# fingerprint is unchanged and reuses its cached output, so refreshing one
+# FAO source only re-cleans that source and re-runs the merges.
+
+import hashlib
+import json
+import os
+import time
+
+import pandas as pd
+
+from etl import formats, sources
+
+RESOURCES_DIR = "Resources"
+CACHE_DIR = ".etl_cache"
+OUTPUTS = ["Cleaned/final_crop_data.csv", "dashboard/final_crop_data.csv", "dashboard/final_crop_data.feather"]
+
+# Bump when the cleaning logic changes so cached stages are rebuilt
+PIPELINE_VERSION = 1
+
+# name -> (reader, source file)
+SOURCE_STAGES = {
+    "pesticides": (sources.read_pesticides, "pesticides.csv"),
+    "rainfall": (sources.read_rainfall, "rainfall.csv"),
+    "temperature": (sources.read_temperature, "temp.csv"),
+    "yield": (sources.read_yield, "yield.csv"),
+}
+
+
+def file_fingerprint(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _combine(*parts):
+    return hashlib.sha256("|".join([str(PIPELINE_VERSION), *parts]).encode()).hexdigest()
+
+
+class Pipeline:
+
+    def __init__(self, resources_dir=RESOURCES_DIR, cache_dir=CACHE_DIR, outputs=None, force=False, log=print):
+        self.resources_dir = resources_dir
+        self.cache_dir = cache_dir
+        self.outputs = OUTPUTS if outputs is None else outputs
+        if not formats.has_pyarrow():
+            skipped = [p for p in self.outputs if p.endswith(formats.BINARY_FORMATS)]
+            if skipped:
+                log(f"pyarrow is not installed, skipping {', '.join(skipped)}")
+            self.outputs = [p for p in self.outputs if p not in skipped]
+        self.force = force
+        self.log = log
+        self.manifest_path = os.path.join(cache_dir, "manifest.json")
+        self.manifest = {}
+        if not force and os.path.exists(self.manifest_path):
+            with open(self.manifest_path) as f:
+                self.manifest = json.load(f)
+
+    def _cache_path(self, name):
+        return os.path.join(self.cache_dir, f"{name}.pkl")
+
+    def _fresh(self, name, fingerprint, paths):
+        return (not self.force and self.manifest.get(name) == fingerprint
+                and all(os.path.exists(p) for p in paths))
+
+    def _stage(self, name, fingerprint, build):
+        # Run build() unless the cached output for this fingerprint exists
+        path = self._cache_path(name)
+        if self._fresh(name, fingerprint, [path]):
+            self.log(f"{name}: up to date")
+            return fingerprint, None
+
+        start = time.perf_counter()
+        frame = build()
+        os.makedirs(self.cache_dir, exist_ok=True)
+        frame.to_pickle(path)
+        self.manifest[name] = fingerprint
+        self.log(f"{name}: {len(frame)} rows in {time.perf_counter() - start:.2f}s")
+        return fingerprint, frame
+
+    def _load(self, name, frame):
+        return frame if frame is not None else pd.read_pickle(self._cache_path(name))
+
+    def run(self):
+        results = {}
+        for name, (reader, filename) in SOURCE_STAGES.items():
+            path = os.path.join(self.resources_dir, filename)
+            results[name] = self._stage(name, _combine(name, file_fingerprint(path)), lambda: reader(path))
+
+        env_fp, env = self._stage(
+            "environment",
+            _combine("environment", *(results[n][0] for n in ("rainfall", "temperature", "pesticides"))),
+            lambda: sources.merge_environment(*(self._load(n, results[n][1]) for n in ("rainfall", "temperature", "pesticides")))
+        )
+        final_fp, final = self._stage(
+            "final",
+            _combine("final", results["yield"][0], env_fp),
+            lambda: sources.merge_final(self._load("yield", results["yield"][1]), self._load("environment", env))
+        )
+
+        # Write the dashboard dataset(s)
+        output_fp = _combine("outputs", final_fp, *self.outputs)
+        if self._fresh("outputs", output_fp, self.outputs):
+            self.log("outputs: up to date")
+        else:
+            final = self._load("final", final)
+            for path in self.outputs:
+                os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+                formats.write_dataset(final, path)
+                self.log(f"wrote {path}")
+            self.manifest["outputs"] = output_fp
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with open(self.manifest_path, "w") as f:
+            json.dump(self.manifest, f, indent=2)
+        return self.outputs
+
+
+def run_pipeline(**kwargs):
+    return Pipeline(**kwargs).run()
@@ -0,0 +1,68 @@
+# Source readers and cleaning steps for the FAO / climate CSVs
+#
+# Each reader loads only the columns the dashboard dataset needs, with
+# explicit compact dtypes, and applies the same rename / coerce logic as
+# data_cleanup.ipynb.
+
+import pandas as pd
+
+KEYS = ['region', 'year']
+
+
+def read_pesticides(path):
+    # Area, Year, Value -> region, year, pesticide_t (tonnes of active ingredients)
+    return pd.read_csv(
+        path,
+        usecols=['Area', 'Year', 'Value'],
+        dtype={'Area': 'str', 'Year': 'int16', 'Value': 'float64'}
+    ).rename(columns={'Area': 'region', 'Year': 'year', 'Value': 'pesticide_t'})
+
+
+def read_rainfall(path):
+    # The header has a leading space (" Area") and missing values are ".."
+    rainfall = pd.read_csv(
+        path,
+        usecols=[0, 1, 2],
+        header=0,
+        names=['region', 'year', 'rainfall_mm'],
+        dtype={'region': 'str', 'year': 'int16', 'rainfall_mm': 'str'}
+    )
+    rainfall['rainfall_mm'] = pd.to_numeric(rainfall['rainfall_mm'].replace("..", pd.NA), errors='coerce')
+    return rainfall
+
+
+def read_temperature(path):
+    # country, year, avg_temp -> region, year, avg_temp_c
+    return pd.read_csv(
+        path,
+        usecols=['year', 'country', 'avg_temp'],
+        dtype={'year': 'int16', 'country': 'str', 'avg_temp': 'float64'}
+    ).rename(columns={'country': 'region', 'avg_temp': 'avg_temp_c'})[['region', 'year', 'avg_temp_c']]
+
+
+def read_yield(path):
+    # Area, Item, Year, Value (hg/ha) -> region, crop, year, yield_hg_ha, yield_t_ha
+    yields = pd.read_csv(
+        path,
+        usecols=['Area', 'Item', 'Year', 'Value'],
+        dtype={'Area': 'str', 'Item': 'str', 'Year': 'int16', 'Value': 'float64'},
+        na_values=['..']
+    ).rename(columns={'Area': 'region', 'Item': 'crop', 'Year': 'year', 'Value': 'yield_hg_ha'})
+
+    # Convert from hectograms/hectare to tons/hectare and drop rows without a yield
+    yields['yield_t_ha'] = yields['yield_hg_ha'] / 100
+    yields = yields.dropna(subset=['yield_t_ha'])
+    yields['yield_hg_ha'] = yields['yield_hg_ha'].astype('int32')
+    return yields[['region', 'crop', 'year', 'yield_hg_ha', 'yield_t_ha']]
+
+
+def merge_environment(rainfall, temperature, pesticides):
+    # Rainfall + temperature + pesticides per (region, year), complete rows only
+    env = pd.merge(rainfall, temperature, on=KEYS, how='inner')
+    env = pd.merge(env, pesticides, on=KEYS, how='inner')
+    return env.dropna(subset=['rainfall_mm', 'avg_temp_c', 'pesticide_t'], how='any')
+
+
+def merge_final(yields, env):
+    # Keep only rows with matching region + year
+    return pd.merge(yields, env, on=KEYS, how='inner')
@@ -0,0 +1,5 @@
+# The dashboard modules import each other by name, as when the app runs from dashboard/
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "dashboard"))
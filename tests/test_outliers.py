@@ -0,0 +1,36 @@
+import numpy as np
+import pandas as pd
+
+from outliers import OutlierEngine
+
+
+def frame():
+    # One crop per region: Maize constant over the years, Rice varying
+    years = list(range(2000, 2012))
+    return pd.DataFrame({
+        'crop': ['Maize'] * len(years) + ['Rice'] * len(years),
+        'region': ['A'] * len(years) + ['B'] * len(years),
+        'year': years * 2,
+        'yield_t_ha': [0.1] * len(years) + [1.0 + 0.1 * (i % 4) for i in range(len(years))],
+    })
+
+
+def test_constant_rolling_window_is_not_scored():
+    df = frame()
+    engine = OutlierEngine(df)
+    scores = engine.scores('zscore', 'crop_region', 5)
+    constant = (df['crop'] == 'Maize').to_numpy()
+
+    assert np.isnan(scores[constant]).all()
+    assert not np.isnan(scores[~constant]).any()
+    assert not engine.flags('zscore', 'crop_region', 5, 2.0)[constant].any()
+
+
+def test_rolling_scores_match_pandas():
+    df = frame()
+    scores = OutlierEngine(df).scores('zscore', 'crop_region', 3)
+    rice = df[df['crop'] == 'Rice']['yield_t_ha']
+    rolling = rice.rolling(3, center=True, min_periods=1)
+    expected = ((rice - rolling.mean()) / rolling.std()).to_numpy(copy=True)
+    expected[[0, -1]] = np.nan                      # edge windows hold 2 rows, under MIN_ROWS
+    np.testing.assert_allclose(scores[(df['crop'] == 'Rice').to_numpy()], expected, atol=1e-9)
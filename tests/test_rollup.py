@@ -0,0 +1,35 @@
+import numpy as np
+import pandas as pd
+
+from rollup import RollupCube, cells_from_frame
+
+
+def frame():
+    return pd.DataFrame({
+        'crop': ['Maize', 'Maize', 'Maize', 'Rice', 'Rice'],
+        'region': ['A', 'A', 'B', 'A', 'B'],
+        'year': [2000, 2000, 2001, 2000, 2001],
+        'yield_t_ha': [2.0, np.nan, 4.0, 3.5, np.nan],
+        'rainfall_mm': [100.0, 200.0, 300.0, 400.0, 500.0],
+        'avg_temp_c': [20.0, 21.0, 22.0, 23.0, 24.0],
+        'pesticide_t': [1.0, 2.0, 3.0, 4.0, 5.0],
+    })
+
+
+def test_means_skip_missing_values():
+    df = frame()
+    cube = RollupCube(cells_from_frame(df))
+
+    pd.testing.assert_series_equal(cube.mean('crop', 'yield_t_ha'), df.groupby('crop')['yield_t_ha'].mean(),
+                                   check_names=False)
+    pd.testing.assert_series_equal(cube.region_stats()['mean_yield'], df.groupby('region')['yield_t_ha'].mean(),
+                                   check_names=False)
+    avg_yield, top_crop, _ = cube.summary()
+    assert avg_yield == round(df['yield_t_ha'].mean(), 2)
+    assert top_crop == 'Rice'
+
+
+def test_mean_of_only_missing_values_is_nan():
+    cube = RollupCube(cells_from_frame(frame()))
+    means = cube.mean(['crop', 'region'], 'yield_t_ha')
+    assert np.isnan(means[('Rice', 'B')])